@@ -0,0 +1,378 @@
+"""
+Synthetic-data benchmarks of the patch pipeline
+
+Generates MPQ/CASC/HomeMade trees shaped like the real game data (paths from
+structure.txt, the same file in several MPQs, realistic file sizes) and times each
+pipeline stage plus full region builds, recording the results to JSON.
+
+    python -m __Misc_Tools.benchmarks.benchmarks --files 20000 --repeat 3 --output new.json
+    python -m __Misc_Tools.benchmarks.benchmarks --compare old.json new.json --fail-above 1.2
+    python -m __Misc_Tools.benchmarks.benchmarks --index-footprint 100000
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parent.parent
+STRUCTURE_FILE = TOOLS_DIR / "mpq_to_casc_converter" / "structure.txt"
+
+MPQ_FOLDERS = ["war3.mpq", "War3x.mpq", "War3xlocal.mpq", "War3Patch.mpq"]
+
+# Median size in bytes per extension, file sizes follow a log-normal distribution around it
+MEDIAN_SIZES = {
+    ".wav": 48 * 1024, ".mp3": 40 * 1024, ".blp": 24 * 1024, ".mdx": 32 * 1024,
+    ".txt": 4 * 1024, ".wts": 8 * 1024, ".j": 16 * 1024, ".slk": 12 * 1024, ".fdf": 6 * 1024,
+}
+DEFAULT_MEDIAN_SIZE = 8 * 1024
+TEXT_EXTENSIONS = {".txt", ".wts", ".j", ".slk", ".fdf", ".ai", ".toc", ".ini"}
+
+def _file_bytes(rng, rel_path, size_scale):
+    """Synthetic content: compressible text for text formats, random bytes otherwise"""
+    ext = Path(rel_path).suffix.lower()
+    size = max(16, int(rng.lognormvariate(0, 0.6) * MEDIAN_SIZES.get(ext, DEFAULT_MEDIAN_SIZE) * size_scale))
+    if ext in TEXT_EXTENSIONS:
+        line = f'KEY_{rng.randrange(100000)}="{rel_path}"\n'.encode('utf-8')
+        return (line * (size // len(line) + 1))[:size]
+    return rng.randbytes(size)
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return len(data)
+
+def generate_synthetic_tree(base_dir, region="frFR", files=5000, casc_files=None, homemade_files=50,
+                            collision_rate=0.3, size_scale=1.0, seed=0):
+    """
+    Create MPQ_Data, CASC_Data and _HomeMade_Data trees for one region under base_dir
+
+    Args:
+        files: Files spread over the four MPQ folders; paths come from structure.txt, then
+               synthetic sound paths once it is exhausted
+        casc_files: Files in the CASC folder (defaults to half of files)
+        homemade_files: Files in the HomeMade folder
+        collision_rate: Share of MPQ files also present in another MPQ (resolved by priority)
+        size_scale: Multiplier of the per-extension median file sizes
+        seed: Makes the tree reproducible
+
+    Returns:
+        Dictionary with the MPQ folder path and file/byte counts per tree
+    """
+    rng = random.Random(seed)
+    base_dir = Path(base_dir)
+    base_dir.mkdir(parents=True, exist_ok=True)
+
+    structure = [line.strip().replace("\\", "/") for line in open(STRUCTURE_FILE, encoding='utf-8') if line.strip()]
+    rng.shuffle(structure)
+
+    def mpq_path_for(i):
+        if i < len(structure):
+            return structure[i]
+        return f"sound/synthetic/set{i // 1000:03d}/voice{i:06d}.wav"
+
+    counts = {"mpq_files": 0, "mpq_bytes": 0, "casc_files": 0, "casc_bytes": 0,
+              "homemade_files": 0, "homemade_bytes": 0}
+
+    # MPQ data, with collisions between the MPQ folders
+    mpq_dir = base_dir / "MPQ_Data" / f"{region}-MPQ"
+    for i in range(files):
+        rel = mpq_path_for(i)
+        folders = rng.sample(MPQ_FOLDERS, 2) if rng.random() < collision_rate else [rng.choice(MPQ_FOLDERS)]
+        for folder in folders:
+            counts["mpq_bytes"] += _write(mpq_dir / folder / rel, _file_bytes(rng, rel, size_scale))
+            counts["mpq_files"] += 1
+    for n in range(max(1, files // 1000)):
+        for ext in (".w3m", ".w3x"):
+            rel = f"Maps/Campaign/Synthetic{n:02d}{ext}"
+            counts["mpq_bytes"] += _write(mpq_dir / "War3x.mpq" / rel, rng.randbytes(int(256 * 1024 * size_scale)))
+            counts["mpq_files"] += 1
+
+    # CASC data, including complete UI files so no translation model is needed
+    casc_dir = base_dir / "CASC_Data" / f"{region}.w3mod"
+    casc_files = files // 2 if casc_files is None else casc_files
+    for rel in rng.sample(structure, min(casc_files, len(structure))):
+        counts["casc_bytes"] += _write(casc_dir / rel, _file_bytes(rng, rel, size_scale))
+        counts["casc_files"] += 1
+    for template, target in [
+        ("worldeditor_translator/worldeditstrings_template.txt", "ui/worldeditstrings.txt"),
+        ("worldeditor_translator/worldeditgamestrings_template.txt", "ui/worldeditgamestrings.txt"),
+        ("wc3keys_translater/globalstrings_template.fdf", "ui/framedef/globalstrings.fdf"),
+    ]:
+        counts["casc_bytes"] += _write(casc_dir / target, (TOOLS_DIR / template).read_bytes())
+        counts["casc_files"] += 1
+    counts["casc_bytes"] += _write(casc_dir / "maps" / "synthetic.w3x" / "war3map.j", b"function main takes nothing returns nothing\n")
+    counts["casc_files"] += 1
+
+    # HomeMade data: converted cutscene audio and fixed maps
+    homemade_dir = base_dir / "_HomeMade_Data" / region
+    for n in range(homemade_files):
+        rel = f"Movies/Cinematic{n:03d}.mp3" if n % 5 else f"maps/campaign/Fixed{n:03d}.w3m"
+        counts["homemade_bytes"] += _write(homemade_dir / rel, _file_bytes(rng, rel, size_scale))
+        counts["homemade_files"] += 1
+
+    return {"mpq_path": str(mpq_dir), **counts}
+
+def synthetic_mpq_index(region_folder, files=100000, collision_rate=0.3, seed=0):
+    """
+    Scan result of an MPQ tree of files paths, as load_mpq_index persists it, without
+    writing any file (paths come from structure.txt, then synthetic sound paths)
+    """
+    from __Misc_Tools.mpq_to_casc_converter.mpq_to_casc_converter import MPQ_PRIORITY
+
+    rng = random.Random(seed)
+    structure = [line.strip().replace("\\", "/") for line in open(STRUCTURE_FILE, encoding='utf-8') if line.strip()]
+    dirs = {".": 0}
+    entries = {}
+    for i in range(files):
+        rel = structure[i] if i < len(structure) else f"sound/synthetic/set{i // 1000:03d}/voice{i:06d}.wav"
+        rel_dir, _, name = rel.rpartition("/")
+        folders = rng.sample(MPQ_FOLDERS, 2) if rng.random() < collision_rate else [rng.choice(MPQ_FOLDERS)]
+        for folder in folders:
+            rel_root = f"{folder}/{rel_dir}" if rel_dir else folder
+            dir_id = dirs.setdefault(rel_root, len(dirs))
+            entries.setdefault(name.lower(), []).append([name, dir_id, MPQ_PRIORITY[folder]])
+    return {"dirs": dirs, "files": entries}
+
+def _legacy_mpq_files(region_folder, index):
+    """The candidate lists mpq_to_casc_converter built before MpqFileIndex, as a footprint baseline"""
+    dir_paths = list(index["dirs"])
+    mpq_files = {}
+    for file_lower, entries in index["files"].items():
+        candidates = []
+        for name, dir_id, priority in entries:
+            parts = f"{dir_paths[dir_id]}/{name}".split("/")
+            candidates.append((region_folder.joinpath(*parts), [p.lower() for p in parts[1:-1]], priority))
+        mpq_files[file_lower] = candidates
+    resolution_index = {}
+    for file_lower, candidates in mpq_files.items():
+        for candidate in candidates:
+            parts = candidate[1]
+            for depth in range(len(parts) + 1):
+                key = (file_lower, tuple(parts[:depth]))
+                current = resolution_index.get(key)
+                if current is None or candidate[2] > current[2]:
+                    resolution_index[key] = candidate
+    return mpq_files, resolution_index
+
+def _compact_mpq_files(region_folder, index):
+    from __Misc_Tools.mpq_to_casc_converter.mpq_to_casc_converter import mpq_file_index, build_resolution_index
+
+    mpq_files = mpq_file_index(region_folder, index)
+    return mpq_files, build_resolution_index(mpq_files)
+
+def mpq_index_footprint(files=100000, seed=0, repeat=3):
+    """
+    Memory held and construction time of the MPQ candidate index, before and after
+    MpqFileIndex, on a synthetic tree of files paths
+
+    Returns:
+        {"legacy" / "compact": {"seconds", "retained_mb", "peak_mb"}}
+    """
+    region_folder = Path(tempfile.gettempdir()) / "frFR-MPQ"
+    index = synthetic_mpq_index(region_folder, files=files, seed=seed)
+    results = {}
+    for label, build in (("legacy", _legacy_mpq_files), ("compact", _compact_mpq_files)):
+        timings = _measure(lambda: build(region_folder, index), repeat)
+        tracemalloc.start()
+        try:
+            built = build(region_folder, index)
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del built
+        results[label] = {
+            "seconds": timings["median"],
+            "retained_mb": round(retained / 1024 / 1024, 1),
+            "peak_mb": round(peak / 1024 / 1024, 1),
+        }
+    return results
+
+def _reset_region(base_dir, region):
+    """Remove every build output and cache of a region so the next build starts cold"""
+    mpq_data = Path(base_dir) / "MPQ_Data"
+    shutil.rmtree(mpq_data / f"{region}-MPQ-converted-to-CASC", ignore_errors=True)
+    (mpq_data / f"{region}-MPQ.index.json").unlink(missing_ok=True)
+    shutil.rmtree(Path(base_dir) / "merged", ignore_errors=True)
+
+def _measure(run, repeat, setup=None, teardown=None):
+    durations = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - started)
+        if teardown:
+            teardown()
+    return {
+        "runs": [round(d, 4) for d in durations],
+        "min": round(min(durations), 4),
+        "median": round(statistics.median(durations), 4),
+    }
+
+def run_benchmarks(base_dir, region="frFR", repeat=3, transfer_mode="auto"):
+    """Time each pipeline stage and full builds of a generated region, returning {stage: timings}"""
+    from __Misc_Tools.mpq_to_casc_converter.mpq_to_casc_converter import load_mpq_index, convert_mpq_to_casc
+    from __Misc_Tools.patches_maker.patches_maker import (
+        build_region, copy_contents, clean_folder, zip_and_remove
+    )
+
+    base_dir = Path(base_dir)
+    mpq_path = base_dir / "MPQ_Data" / f"{region}-MPQ"
+    converted = Path(f"{mpq_path}-converted-to-CASC")
+    staging = base_dir / "bench_staging" / f"{region}_patch"
+    silent = lambda message: None
+    results = {}
+
+    def stage_copy(skip_unchanged=False):
+        if not skip_unchanged:
+            shutil.rmtree(staging.parent, ignore_errors=True)
+        copy_contents(converted, staging, skip_sound=True, label="copy", progress_callback=silent,
+                      transfer_mode=transfer_mode, skip_unchanged=skip_unchanged)
+        copy_contents(base_dir / "CASC_Data" / f"{region}.w3mod", staging, skip_w3x=True,
+                      progress_callback=silent, transfer_mode=transfer_mode, skip_unchanged=skip_unchanged)
+
+    def drop_staging():
+        shutil.rmtree(staging.parent, ignore_errors=True)
+
+    results["mpq_index"] = _measure(
+        lambda: load_mpq_index(mpq_path), repeat,
+        setup=lambda: _reset_region(base_dir, region),
+    )
+    results["convert_mpq_to_casc"] = _measure(
+        lambda: convert_mpq_to_casc(mpq_path, silent, transfer_mode=transfer_mode), repeat,
+        setup=lambda: _reset_region(base_dir, region),
+    )
+    results["copy_contents"] = _measure(stage_copy, repeat, teardown=drop_staging)
+    # Copying again into the populated staging folder, as when iterating on HomeMade data
+    results["copy_contents_unchanged"] = _measure(lambda: stage_copy(skip_unchanged=True), repeat,
+                                                  setup=stage_copy, teardown=drop_staging)
+    results["clean_folder"] = _measure(lambda: clean_folder(staging, silent), repeat,
+                                       setup=stage_copy, teardown=drop_staging)
+    results["zip_and_remove"] = _measure(lambda: zip_and_remove(staging, silent), repeat,
+                                         setup=stage_copy, teardown=drop_staging)
+
+    results["build_region"] = _measure(
+        lambda: build_region(mpq_path, silent, transfer_mode=transfer_mode), repeat,
+        setup=lambda: _reset_region(base_dir, region),
+    )
+    results["build_region_stream"] = _measure(
+        lambda: build_region(mpq_path, silent, stream_to_zip=True, transfer_mode=transfer_mode), repeat,
+        setup=lambda: _reset_region(base_dir, region),
+    )
+    # Inputs unchanged since the previous build: the cached archive is reused
+    build_region(mpq_path, silent, transfer_mode=transfer_mode)
+    results["build_region_unchanged"] = _measure(
+        lambda: build_region(mpq_path, silent, transfer_mode=transfer_mode), repeat,
+    )
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=TOOLS_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(old, new, fail_above=None):
+    """Print the median ratio new/old per stage; returns the stages slower than fail_above"""
+    regressions = []
+    print(f"{'stage':<26}{'old (s)':>10}{'new (s)':>10}{'ratio':>8}")
+    for stage, timings in new["results"].items():
+        previous = old["results"].get(stage)
+        if not previous:
+            print(f"{stage:<26}{'-':>10}{timings['median']:>10.3f}{'-':>8}")
+            continue
+        ratio = timings["median"] / previous["median"] if previous["median"] else float("inf")
+        flag = ""
+        if fail_above and ratio > fail_above:
+            regressions.append(stage)
+            flag = "  ⚠️"
+        print(f"{stage:<26}{previous['median']:>10.3f}{timings['median']:>10.3f}{ratio:>8.2f}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the patch pipeline on synthetic data")
+    parser.add_argument("--files", type=int, default=5000, help="Files in the synthetic MPQ tree")
+    parser.add_argument("--casc-files", type=int, default=None, help="Files in the CASC tree (default files/2)")
+    parser.add_argument("--homemade-files", type=int, default=50)
+    parser.add_argument("--collision-rate", type=float, default=0.3)
+    parser.add_argument("--size-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--transfer-mode", default="auto")
+    parser.add_argument("--work-dir", default=None, help="Where the tree is generated (a temporary folder by default)")
+    parser.add_argument("--output", default=None, help="JSON file for the results (printed otherwise)")
+    parser.add_argument("--index-footprint", type=int, default=None, metavar="FILES",
+                        help="Only compare the MPQ index footprint before/after interning, on FILES paths")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files")
+    parser.add_argument("--fail-above", type=float, default=None,
+                        help="With --compare, exit 1 if a stage median grew by more than this ratio")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            new = json.load(f)
+        return 1 if compare_results(old, new, args.fail_above) else 0
+
+    if args.index_footprint:
+        footprint = mpq_index_footprint(args.index_footprint, seed=args.seed, repeat=args.repeat)
+        print(f"{'index':<10}{'time (s)':>10}{'held MB':>10}{'peak MB':>10}")
+        for label, measured in footprint.items():
+            print(f"{label:<10}{measured['seconds']:>10.3f}{measured['retained_mb']:>10.1f}{measured['peak_mb']:>10.1f}")
+        return 0
+
+    from __Misc_Tools.translation_memory.translation_memory import TRANSLATION_MEMORY_ENV, MEMORY_FILE_NAME
+
+    # Benchmarks never reach a translation service
+    os.environ.setdefault("WC3_FDF_BACKEND", "noop")
+
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="wc3_bench_"))
+    # Nor the translation memory of real builds: theirs lives in the work folder, outside
+    # the build cache that cold runs delete
+    os.environ.setdefault(TRANSLATION_MEMORY_ENV, str(work_dir / MEMORY_FILE_NAME))
+    try:
+        started = time.perf_counter()
+        tree = generate_synthetic_tree(
+            work_dir, files=args.files, casc_files=args.casc_files, homemade_files=args.homemade_files,
+            collision_rate=args.collision_rate, size_scale=args.size_scale, seed=args.seed,
+        )
+        generate_seconds = time.perf_counter() - started
+        results = run_benchmarks(work_dir, repeat=args.repeat, transfer_mode=args.transfer_mode)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parameters": {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+            "tree": {key: value for key, value in tree.items() if key != "mpq_path"},
+            "generate_seconds": round(generate_seconds, 3),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
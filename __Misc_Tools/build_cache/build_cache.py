@@ -0,0 +1,130 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+
+from __Misc_Tools.tree_walk.tree_walk import file_stat
+
+BUILD_CACHE_VERSION = 1
+
+class BuildCache:
+    """
+    Content-addressed cache of a region build
+
+    Every input file is identified by a hash of its content. Hashes are memoized by
+    (path, size, mtime) so unchanged files are not re-read on the next build. The cache
+    remembers the key of the last successful build and the zip it produced, and keeps
+    translated text files by the hash of their template, source and translator settings.
+
+    Args:
+        cache_dir: Folder holding the cache (shared by all regions)
+        region_code: Region whose build state is tracked
+    """
+    def __init__(self, cache_dir, region_code):
+        self.cache_dir = Path(cache_dir)
+        self.region_code = region_code
+        self.state_file = self.cache_dir / f"{region_code}.json"
+        self.translations_dir = self.cache_dir / "translations"
+
+        self._known_digests = {}
+        self._used_digests = {}
+        self._last_build = None
+
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("version") == BUILD_CACHE_VERSION:
+                self._known_digests = state.get("digests", {})
+                self._last_build = state.get("build")
+        except (OSError, ValueError):
+            pass
+
+    def file_digest(self, path):
+        """Content hash of a file, reusing the memoized one while size and mtime are unchanged"""
+        path = str(path)
+        stat = file_stat(path)
+        known = self._used_digests.get(path) or self._known_digests.get(path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            digest = known[2]
+        else:
+            hasher = hashlib.blake2b(digest_size=16)
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+
+        self._used_digests[path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def build_key(self, manifest, templates, config):
+        """Hash of every output path with its source content, the templates and the translator settings"""
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(json.dumps([BUILD_CACHE_VERSION, config], sort_keys=True).encode('utf-8'))
+        for template in templates:
+            template = Path(template)
+            digest = self.file_digest(template) if template.exists() else "-"
+            hasher.update(f"template:{template.name}:{digest}\n".encode('utf-8'))
+        for rel_path, src in sorted(manifest.items(), key=lambda item: item[0].as_posix()):
+            hasher.update(f"{rel_path.as_posix()}:{self.file_digest(src)}\n".encode('utf-8'))
+        return hasher.hexdigest()
+
+    def translation_key(self, template_path, source_path, config):
+        """Hash identifying the translation of source_path against template_path"""
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(json.dumps([BUILD_CACHE_VERSION, config], sort_keys=True).encode('utf-8'))
+        hasher.update(self.file_digest(template_path).encode('utf-8'))
+        hasher.update(self.file_digest(source_path).encode('utf-8'))
+        return hasher.hexdigest()
+
+    def translation(self, key):
+        """Previously translated content for a translation key, or None"""
+        try:
+            with open(self.translations_dir / f"{key}.txt", 'r', encoding='utf-8', newline='') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def store_translation(self, key, content):
+        self.translations_dir.mkdir(parents=True, exist_ok=True)
+        target = self.translations_dir / f"{key}.txt"
+        tmp_file = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        os.replace(tmp_file, target)
+
+    def reusable_zip(self, key):
+        """Zip produced by the last build if it had the same key and was not touched since"""
+        build = self._last_build
+        if not build or build.get("key") != key:
+            return None
+        zip_path = Path(build["zip"])
+        try:
+            stat = zip_path.stat()
+        except OSError:
+            return None
+        if stat.st_size != build["zip_size"] or stat.st_mtime_ns != build["zip_mtime_ns"]:
+            return None
+        return zip_path
+
+    def record_build(self, key, zip_path):
+        """Remember a successful build and persist the digests used by it"""
+        stat = Path(zip_path).stat()
+        self._last_build = {
+            "key": key,
+            "zip": str(zip_path),
+            "zip_size": stat.st_size,
+            "zip_mtime_ns": stat.st_mtime_ns,
+        }
+        self.save()
+
+    def save(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        state = {
+            "version": BUILD_CACHE_VERSION,
+            "digests": self._used_digests or self._known_digests,
+            "build": self._last_build,
+        }
+        tmp_file = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
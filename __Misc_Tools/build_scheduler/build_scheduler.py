@@ -0,0 +1,119 @@
+import os
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from __Misc_Tools.progress_events.progress_events import ProgressEvent
+from __Misc_Tools.model_pool.model_pool import configure_model_pool, model_budget_bytes
+
+class StageLimits:
+    """Cross-process semaphores bounding the I/O-heavy and translation stages of concurrent builds"""
+    def __init__(self, manager, io_slots, translation_slots):
+        self.io = manager.BoundedSemaphore(io_slots)
+        self.translation = manager.BoundedSemaphore(translation_slots)
+
+def _init_worker(model_budget):
+    """Process pool initializer: give the worker its share of the model RAM budget"""
+    configure_model_pool(model_budget)
+
+def _build_region_worker(lang, mpq_path, stream_to_zip, stage_limits, transfer_mode, skip_unchanged, batch_size,
+                         events):
+    """Process pool entry point: build one region and forward its progress messages"""
+    def progress_callback(message):
+        if isinstance(message, ProgressEvent):
+            message = message._replace(region=lang)
+        events.put((lang, message))
+
+    try:
+        # Imported here so the GUI process does not load the build pipeline up front
+        from __Misc_Tools.patches_maker.patches_maker import build_region
+
+        return build_region(mpq_path, progress_callback, stream_to_zip=stream_to_zip,
+                            stage_limits=stage_limits, transfer_mode=transfer_mode,
+                            skip_unchanged=skip_unchanged, batch_size=batch_size)
+    except Exception as e:
+        progress_callback(f"⛔ Build crashed for {lang}: {str(e)}")
+        return False
+
+class BuildScheduler:
+    """
+    Run region builds concurrently in a process pool
+
+    Args:
+        workers: Number of regions built at once (defaults to the CPU count)
+        io_slots: Regions allowed in a copy/convert/zip stage at once (defaults to workers)
+        translation_slots: Regions allowed to load and run translation models at once
+        stream_to_zip: Build patches directly into their zip (see build_patch_for_region)
+        transfer_mode: How staged files are placed (see file_transfer.transfer_file)
+        skip_unchanged: Keep staged files that still match their source (see build_region)
+        batch_size: Strings per translation model call (defaults to the translator's)
+
+    The model RAM budget (WC3_MODEL_RAM_BUDGET_MB) covers the whole build: models are
+    only resident while a region holds a translation slot, so each worker process gets
+    the budget divided by the number of slots that can be held at once.
+    """
+    def __init__(self, workers=None, io_slots=None, translation_slots=1, stream_to_zip=False,
+                 transfer_mode="auto", skip_unchanged=False, batch_size=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.io_slots = max(1, io_slots or self.workers)
+        self.translation_slots = max(1, translation_slots)
+        self.stream_to_zip = stream_to_zip
+        self.transfer_mode = transfer_mode
+        self.skip_unchanged = skip_unchanged
+        self.batch_size = batch_size
+        self.model_budget = model_budget_bytes() // min(self.workers, self.translation_slots)
+
+    def run(self, regions, progress_callback):
+        """
+        Build every (lang, mpq_path) region
+
+        progress_callback(lang, message) is called from the calling thread for every
+        progress message (a string or a ProgressEvent) of every region.
+
+        Returns:
+            Dictionary of lang -> True/False build result
+        """
+        results = {}
+        if not regions:
+            return results
+
+        workers = min(self.workers, len(regions))
+
+        with multiprocessing.Manager() as manager:
+            events = manager.Queue()
+            stage_limits = StageLimits(manager, self.io_slots, self.translation_slots)
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.model_budget,)) as pool:
+                futures = {
+                    pool.submit(
+                        _build_region_worker, lang, mpq_path, self.stream_to_zip, stage_limits,
+                        self.transfer_mode, self.skip_unchanged, self.batch_size, events
+                    ): lang
+                    for lang, mpq_path in regions
+                }
+                pending = set(futures)
+
+                while pending:
+                    done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                    self._drain(events, progress_callback)
+                    for future in done:
+                        lang = futures[future]
+                        try:
+                            results[lang] = bool(future.result())
+                        except Exception as e:
+                            progress_callback(lang, f"⛔ Build worker failed for {lang}: {str(e)}")
+                            results[lang] = False
+
+                self._drain(events, progress_callback)
+
+        return results
+
+    @staticmethod
+    def _drain(events, progress_callback):
+        while True:
+            try:
+                lang, message = events.get_nowait()
+            except queue.Empty:
+                return
+            progress_callback(lang, message)
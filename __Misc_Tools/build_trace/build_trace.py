@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+
+from __Misc_Tools.memory_profile.memory_profile import MemoryProfiler, memory_profile_from_env, MB
+
+# Folder receiving one trace per region build; tracing is off when unset
+TRACE_DIR_ENV = "WC3_BUILD_TRACE_DIR"
+
+# Trace of the build running in the current thread/context, if tracing is on
+_active_trace = ContextVar("active_trace", default=None)
+
+class BuildTrace:
+    """
+    Timing spans of one region build
+
+    Spans are recorded as Chrome "complete" events (ph "X"), with wall clock based
+    timestamps so traces of regions built in different processes line up when merged.
+
+    With a MemoryProfiler, every span also records its Python and resident memory peaks,
+    and the top-level stages the allocation sites still holding the most memory.
+
+    Args:
+        region: Region code the build is for
+        memory: Started MemoryProfiler, or None to only record timings
+    """
+    def __init__(self, region, memory=None):
+        self.region = region
+        self.memory = memory
+        self.pid = os.getpid()
+        self.events = []
+        self._depth = 0
+        self._lock = threading.Lock()
+        self._wall_origin_ns = time.time_ns()
+        self._perf_origin_ns = time.perf_counter_ns()
+
+    def _timestamp_us(self, perf_ns):
+        return (self._wall_origin_ns + perf_ns - self._perf_origin_ns) / 1000
+
+    @contextmanager
+    def span(self, name, **args):
+        """Time the enclosed block as a span named name, with args shown in the trace viewer"""
+        depth = self._depth
+        self._depth += 1
+        if self.memory:
+            self.memory.enter()
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter_ns() - started
+            self._depth = depth
+            memory = self.memory.leave(snapshot=depth <= 1) if self.memory else None
+            if memory:
+                args = {**args, "python_peak_mb": round(memory["python_peak"] / MB, 1),
+                        "rss_peak_mb": round(memory["rss_peak"] / MB, 1)}
+            event = {
+                "name": name,
+                "cat": "build",
+                "ph": "X",
+                "ts": self._timestamp_us(started),
+                "dur": duration / 1000,
+                "pid": self.pid,
+                "tid": threading.get_ident(),
+                "args": {key: str(value) for key, value in args.items()},
+                "depth": depth,
+                "memory": memory,
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def to_chrome(self):
+        """Chrome/Perfetto trace object of the recorded spans"""
+        trace_events = [{
+            "name": "process_name", "ph": "M", "pid": self.pid,
+            "args": {"name": f"build {self.region}"},
+        }]
+        for event in sorted(self.events, key=lambda event: event["ts"]):
+            trace_events.append({key: value for key, value in event.items() if key not in ("depth", "memory")})
+        if self.memory:
+            trace_events.extend({
+                "name": "rss", "ph": "C", "pid": self.pid, "ts": self._timestamp_us(sampled),
+                "args": {"MB": round(rss / MB, 1)},
+            } for sampled, rss in self.memory.samples)
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def summary(self):
+        """
+        (depth, name, calls, seconds, python peak, rss peak) rows, in the order stages first
+        started; peaks are in bytes, 0 without memory profiling
+        """
+        rows = {}
+        for event in sorted(self.events, key=lambda event: event["ts"]):
+            row = rows.setdefault((event["depth"], event["name"]), [0, 0.0, 0, 0])
+            row[0] += 1
+            row[1] += event["dur"] / 1e6
+            if event["memory"]:
+                row[2] = max(row[2], event["memory"]["python_peak"])
+                row[3] = max(row[3], event["memory"]["rss_peak"])
+        return [(depth, name, *row) for (depth, name), row in rows.items()]
+
+    def summary_table(self):
+        """Summary as text lines: stages indented by nesting, with calls, time and share of the build"""
+        rows = self.summary()
+        total = sum(row[3] for row in rows if row[0] == 0) or 1.0
+        header = f"{'Stage':<48} {'Calls':>6} {'Time (s)':>10} {'Share':>7}"
+        if self.memory:
+            header += f" {'Py peak MB':>11} {'RSS peak MB':>12}"
+        lines = [header]
+        for depth, name, calls, seconds, python_peak, rss_peak in rows:
+            label = ("  " * depth + name)[:48]
+            line = f"{label:<48} {calls:>6} {seconds:>10.3f} {seconds / total:>7.1%}"
+            if self.memory:
+                line += f" {python_peak / MB:>11.1f} {rss_peak / MB:>12.1f}"
+            lines.append(line)
+        return lines
+
+    def memory_report(self):
+        """Text lines listing, for each top-level stage, its peaks and largest live allocation sites"""
+        lines = [f"Memory profile of the {self.region} build"]
+        for event in sorted(self.events, key=lambda event: event["ts"]):
+            memory = event["memory"]
+            if not memory or "top_allocations" not in memory:
+                continue
+            lines.append("")
+            lines.append(f"{'  ' * event['depth']}{event['name']}: Python peak {memory['python_peak'] / MB:.1f} MB, "
+                         f"RSS peak {memory['rss_peak'] / MB:.1f} MB")
+            for site, size in memory["top_allocations"]:
+                lines.append(f"{'  ' * event['depth']}  {size / MB:>8.2f} MB  {site}")
+        return lines
+
+    def write(self, trace_dir):
+        """Write <region>_<time>.trace.json and its .summary.txt table, returning the trace path"""
+        trace_dir = Path(trace_dir)
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{self.region}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.pid}"
+        trace_path = trace_dir / f"{stem}.trace.json"
+        trace_path.write_text(json.dumps(self.to_chrome()), encoding='utf-8')
+        (trace_dir / f"{stem}.summary.txt").write_text("\n".join(self.summary_table()) + "\n", encoding='utf-8')
+        if self.memory:
+            (trace_dir / f"{stem}.memory.txt").write_text("\n".join(self.memory_report()) + "\n", encoding='utf-8')
+        return trace_path
+
+def span(name, **args):
+    """Span of the active build trace, or a no-op when tracing is off"""
+    trace = _active_trace.get()
+    if trace is None:
+        return nullcontext()
+    return trace.span(name, **args)
+
+def trace_dir_from_env():
+    return os.environ.get(TRACE_DIR_ENV) or None
+
+@contextmanager
+def trace_region(region, progress_callback, trace_dir=None, memory=None):
+    """
+    Trace the enclosed region build when tracing is enabled
+
+    trace_dir defaults to the WC3_BUILD_TRACE_DIR environment variable (inherited by
+    build worker processes). Once the build ends, the trace is written there and its
+    summary table is reported through progress_callback.
+
+    memory (default: the WC3_BUILD_MEMORY_PROFILE environment variable) also profiles
+    the memory of every stage, adding a <region>_*.memory.txt report.
+    """
+    trace_dir = trace_dir or trace_dir_from_env()
+    if not trace_dir or _active_trace.get() is not None:
+        yield None
+        return
+
+    if memory is None:
+        memory = memory_profile_from_env()
+    profiler = None
+    if memory:
+        profiler = MemoryProfiler(ignore_files=[__file__])
+        profiler.start()
+
+    trace = BuildTrace(region, profiler)
+    token = _active_trace.set(trace)
+    try:
+        with trace.span("build_region", region=region):
+            yield trace
+    finally:
+        _active_trace.reset(token)
+        if profiler:
+            profiler.stop()
+        try:
+            trace_path = trace.write(trace_dir)
+            progress_callback(f"  | ⏱️ Build timings for {region}:")
+            for line in trace.summary_table():
+                progress_callback(f"  |   | {line}")
+            if profiler:
+                _, _, _, _, python_peak, rss_peak = trace.summary()[0]
+                progress_callback(f"  | 🧠 Peak memory for {region}: {rss_peak / MB:.0f} MB resident, "
+                                  f"{python_peak / MB:.0f} MB Python objects")
+            progress_callback(f"  | ⏱️ Trace written: {trace_path}")
+        except Exception as e:
+            progress_callback(f"  | ⚠️ Could not write build trace: {str(e)}")
+
+def merge_traces(trace_paths, output_path):
+    """Merge region traces into one file, so parallel builds show side by side in the viewer"""
+    trace_events = []
+    for trace_path in trace_paths:
+        with open(trace_path, 'r', encoding='utf-8') as f:
+            trace_events.extend(json.load(f)["traceEvents"])
+    Path(output_path).write_text(json.dumps({"traceEvents": trace_events, "displayTimeUnit": "ms"}),
+                                 encoding='utf-8')
+    return Path(output_path)
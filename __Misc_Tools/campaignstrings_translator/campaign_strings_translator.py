@@ -1,12 +1,26 @@
 from configparser import ConfigParser
 
-def convert_campaign_strings(template_file, target_file):
-    """Convertit le fichier campaignstrings.txt pour correspondre au format du template"""
-    # Lire et parser le template
+from __Misc_Tools.template_cache.template_cache import FrozenDict
+
+def parse_campaign_template(template_file):
+    """Lit le template en sections immuables : {section: {clé: valeur}}"""
     template_cfg = ConfigParser(allow_no_value=True, strict=False)
     template_cfg.optionxform = str  # préserver la casse
     with open(template_file, 'r', encoding='utf-8') as f:
         template_cfg.read_file(f)
+    return FrozenDict(
+        (section, FrozenDict(template_cfg[section].items()))
+        for section in template_cfg.sections()
+    )
+
+def convert_campaign_strings(template_file, target_file, template=None):
+    """Convertit le fichier campaignstrings.txt pour correspondre au format du template
+
+    template peut être le template déjà parsé par parse_campaign_template
+    """
+    # Lire et parser le template
+    if template is None:
+        template = parse_campaign_template(template_file)
     
     # Lire et parser le fichier cible en gérant le BOM
     trans_cfg = ConfigParser(allow_no_value=True, strict=False)
@@ -19,13 +33,13 @@ def convert_campaign_strings(template_file, target_file):
     output_cfg.optionxform = str
     
     # Traiter chaque section du template
-    for section in template_cfg.sections():
+    for section in template:
         if not output_cfg.has_section(section):
             output_cfg.add_section(section)
             
         # Copier toutes les clés du template vers la sortie
-        for key in template_cfg[section]:
-            output_cfg[section][key] = template_cfg[section][key]
+        for key, value in template[section].items():
+            output_cfg[section][key] = value
             
         # Si la section existe dans la traduction, appliquer les traductions
         if trans_cfg.has_section(section):
@@ -42,11 +56,11 @@ def convert_campaign_strings(template_file, target_file):
             }
             
             for template_key, trans_key in cinematic_mapping.items():
-                if (template_cfg.has_option(section, template_key) and 
+                if (template_key in template[section] and 
                     trans_cfg.has_option(section, trans_key)):
                     
                     # Extraire les parties du template
-                    template_value = template_cfg[section][template_key]
+                    template_value = template[section][template_key]
                     if template_value.strip() == '':
                         # Gérer les valeurs vides
                         new_value = ''
@@ -65,7 +79,7 @@ def convert_campaign_strings(template_file, target_file):
                     output_cfg[section][template_key] = new_value
             
             # Traiter les missions
-            mission_keys = [k for k in template_cfg[section] if k.startswith('Mission')]
+            mission_keys = [k for k in template[section] if k.startswith('Mission')]
             for mission_key in mission_keys:
                 # Extraire le numéro de mission
                 mission_num = mission_key[7:]
@@ -80,7 +94,7 @@ def convert_campaign_strings(template_file, target_file):
                 
                 if has_title and has_mission_name:
                     # Extraire les parties du template
-                    template_value = template_cfg[section][mission_key]
+                    template_value = template[section][mission_key]
                     template_parts = [part.strip('" ') for part in template_value.split(',')]
                     
                     if len(template_parts) >= 3:
@@ -0,0 +1,276 @@
+import os
+import shutil
+import hashlib
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from __Misc_Tools.tree_walk.tree_walk import file_stat
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl request cloning a whole file on CoW filesystems (btrfs, XFS, bcachefs...)
+FICLONE = 0x40049409
+
+TRANSFER_MODES = ("auto", "hardlink", "reflink", "copy")
+
+# TransferStats method of destination files left in place by skip_unchanged
+UNCHANGED = "unchanged"
+
+# Copies keep the source mtime, but some filesystems store it less precisely
+MTIME_WINDOW_NS = 1_000_000
+
+class TransferStats:
+    """Count how many files (and bytes) each transfer method handled"""
+    def __init__(self):
+        self.files = Counter()
+        self.bytes = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, method, size):
+        with self._lock:
+            self.files[method] += 1
+            self.bytes[method] += size
+
+    def summary(self):
+        if not self.files:
+            return "no files transferred"
+        return ", ".join(
+            f"{method}: {count} ({self.bytes[method] / (1024 * 1024):.1f} MB)"
+            for method, count in self.files.most_common()
+        )
+
+def _hardlink(src, dest):
+    os.link(src, dest)
+
+def _reflink(src, dest):
+    if fcntl is None:
+        raise OSError("reflink is not supported on this platform")
+    try:
+        with open(src, 'rb') as fsrc, open(dest, 'wb') as fdest:
+            fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+    except OSError:
+        os.unlink(dest)
+        raise
+    shutil.copystat(src, dest)
+
+def _copy_file_range(src, dest):
+    if not hasattr(os, "copy_file_range"):
+        raise OSError("copy_file_range is not supported on this platform")
+    try:
+        with open(src, 'rb') as fsrc, open(dest, 'wb') as fdest:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                sent = os.copy_file_range(fsrc.fileno(), fdest.fileno(), remaining)
+                if sent == 0:
+                    # Source shorter than its size or a filesystem refusing the range: let copy2 handle it
+                    raise OSError(f"copy_file_range stopped with {remaining} bytes left")
+                remaining -= sent
+    except OSError:
+        os.unlink(dest)
+        raise
+    shutil.copystat(src, dest)
+
+def _copy(src, dest):
+    shutil.copy2(src, dest)
+
+# Methods tried for each mode, in order, plain copy always being the last resort
+_STRATEGIES = {
+    "auto": [("hardlink", _hardlink), ("reflink", _reflink), ("copy_file_range", _copy_file_range)],
+    "hardlink": [("hardlink", _hardlink)],
+    "reflink": [("reflink", _reflink), ("copy_file_range", _copy_file_range)],
+    "copy": [],
+}
+
+def transfer_file(src, dest, mode="auto", stats=None):
+    """
+    Place a copy of src at dest using the cheapest method the filesystem allows
+
+    Args:
+        src: Source file
+        dest: Destination file (its parent folder must exist); replaced if present
+        mode: "auto" (hardlink, then reflink/copy_file_range, then copy), "hardlink",
+              "reflink" or "copy". Unsupported methods fall back to a plain copy.
+        stats: TransferStats to record the method used (optional)
+
+    Returns:
+        Name of the method used
+    """
+    if mode not in _STRATEGIES:
+        raise ValueError(f"Unknown transfer mode: {mode}")
+
+    # Never write through an existing file: it may be a hardlink to a source file
+    try:
+        os.unlink(dest)
+    except FileNotFoundError:
+        pass
+
+    method = "copy"
+    for name, strategy in _STRATEGIES[mode]:
+        try:
+            strategy(src, dest)
+            method = name
+            break
+        except OSError:
+            continue
+    else:
+        _copy(src, dest)
+
+    if stats is not None:
+        stats.record(method, os.path.getsize(dest))
+    return method
+
+def file_hash(path):
+    """Content hash of a file"""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.digest()
+
+def is_unchanged(src, dest, compare_hash=False):
+    """
+    Whether dest already holds the content of src, like rsync's quick check
+
+    Files of different sizes always differ and a hardlink to src never does. Otherwise
+    the mtimes are compared, or with compare_hash the content hashes.
+    """
+    try:
+        dest_stat = os.stat(dest)
+    except FileNotFoundError:
+        return False
+    src_stat = file_stat(src)
+    if dest_stat.st_size != src_stat.st_size:
+        return False
+    if os.path.samestat(src_stat, dest_stat):
+        return True
+    if compare_hash:
+        return file_hash(src) == file_hash(dest)
+    return abs(dest_stat.st_mtime_ns - src_stat.st_mtime_ns) <= MTIME_WINDOW_NS
+
+def write_text_file(path, content):
+    """Write text to path without modifying a file it may be hardlinked to"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+class CopyEngine:
+    """
+    Transfer many files concurrently with a bounded amount of data in flight
+
+    Destination folders are created once up front, then files are handed to a thread
+    pool; a new file is only started while the bytes of unfinished transfers stay under
+    max_inflight_bytes (a single larger file is still allowed on its own). Each call to
+    copy() completes before returning, so successive calls keep their overlay order.
+
+    Args:
+        workers: Number of copy threads (defaults to 4 per CPU, at most 32)
+        max_inflight_bytes: Upper bound of bytes being transferred at once
+        transfer_mode: See transfer_file
+        stats: TransferStats shared by every copy (optional)
+        skip_unchanged: Leave destination files that already match their source (see
+                        is_unchanged), counting them as UNCHANGED in stats
+        compare_hash: With skip_unchanged, compare contents instead of mtimes
+    """
+    def __init__(self, workers=None, max_inflight_bytes=256 * 1024 * 1024, transfer_mode="auto", stats=None,
+                 skip_unchanged=False, compare_hash=False):
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        self.max_inflight_bytes = max_inflight_bytes
+        self.transfer_mode = transfer_mode
+        self.stats = stats if stats is not None else TransferStats()
+        self.skip_unchanged = skip_unchanged
+        self.compare_hash = compare_hash
+
+    @staticmethod
+    def _dedupe(pairs):
+        """Keep one transfer per destination (case-insensitively where the OS is)
+
+        Matches sequential copying: the last source wins, the first spelling of the name stays.
+        """
+        by_dest = {}
+        for src, dest in pairs:
+            key = os.path.normcase(str(dest))
+            previous = by_dest.get(key)
+            by_dest[key] = (src, previous[1] if previous else dest)
+        return list(by_dest.values())
+
+    def copy(self, pairs, progress=None, progress_every=50):
+        """
+        Transfer every (source, destination) pair
+
+        Args:
+            pairs: Iterable of (source file, destination file)
+            progress: Called as progress(done, total) from the calling thread, at least
+                      progress_every files apart and once at the end (optional)
+
+        Returns:
+            List of (source, exception) for transfers that failed
+        """
+        pairs = self._dedupe(pairs)
+        total = len(pairs)
+        errors = []
+        if not total:
+            return errors
+
+        # Create every destination folder once instead of once per file
+        for folder in sorted({dest.parent for _, dest in pairs}, key=lambda p: len(p.parts)):
+            folder.mkdir(parents=True, exist_ok=True)
+
+        condition = threading.Condition()
+        state = {"inflight": 0, "done": 0}
+
+        def run(src, dest, size):
+            try:
+                if self.skip_unchanged and is_unchanged(src, dest, self.compare_hash):
+                    self.stats.record(UNCHANGED, size)
+                else:
+                    transfer_file(src, dest, self.transfer_mode, self.stats)
+            except Exception as e:
+                with condition:
+                    errors.append((src, e))
+            finally:
+                with condition:
+                    state["inflight"] -= size
+                    state["done"] += 1
+                    condition.notify_all()
+
+        reported = 0
+
+        def report(done):
+            nonlocal reported
+            if progress and (done - reported >= progress_every or (done == total and reported != total)):
+                reported = done
+                progress(done, total)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for src, dest in pairs:
+                try:
+                    size = file_stat(src).st_size
+                except OSError:
+                    size = 0
+
+                with condition:
+                    while state["inflight"] and state["inflight"] + size > self.max_inflight_bytes:
+                        condition.wait()
+                    state["inflight"] += size
+                    done = state["done"]
+
+                report(done)
+                pool.submit(run, src, dest, size)
+
+            # Keep reporting from this thread until the last transfer finished
+            done = 0
+            while done < total:
+                with condition:
+                    if state["done"] == done:
+                        condition.wait()
+                    done = state["done"]
+                report(done)
+
+        return errors
@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import threading
+import tracemalloc
+
+# Enables memory profiling of traced builds (see build_trace.trace_region)
+MEMORY_PROFILE_ENV = "WC3_BUILD_MEMORY_PROFILE"
+
+# Delay between two resident memory samples, in seconds
+RSS_SAMPLE_INTERVAL = 0.05
+
+# Allocation sites kept per top-level stage
+TOP_ALLOCATIONS = 5
+
+MB = 1024 * 1024
+
+def memory_profile_from_env():
+    return os.environ.get(MEMORY_PROFILE_ENV, "").lower() in ("1", "true", "yes", "on")
+
+def _windows_rss():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+def current_rss():
+    """Resident memory of this process in bytes, or None where it cannot be read"""
+    try:
+        if sys.platform == "win32":
+            return _windows_rss()
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class MemoryProfiler:
+    """
+    Peak memory of nested stages, from tracemalloc and resident memory sampling
+
+    tracemalloc only sees Python allocations; resident memory (RSS) also covers native
+    buffers such as loaded translation models. Both are process-wide, so stages are only
+    attributed correctly with one build per process (as the build scheduler runs them).
+
+    Call enter() and leave() around each stage; leave() returns the stage peaks.
+    Allocations made in ignore_files (and in this module) are left out of snapshots.
+    """
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL, top_allocations=TOP_ALLOCATIONS, ignore_files=()):
+        self.interval = interval
+        self.top_allocations = top_allocations
+        self.ignore_files = [__file__, tracemalloc.__file__, *ignore_files]
+        self.samples = []
+        self._stack = []
+        self._lock = threading.Lock()
+        self._rss_peak = 0
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._sample()
+        self._sampler = threading.Thread(target=self._run_sampler, name="rss-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _sample(self):
+        rss = current_rss()
+        if rss is None:
+            return
+        with self._lock:
+            self._rss_peak = max(self._rss_peak, rss)
+            self.samples.append((time.perf_counter_ns(), rss))
+
+    def _run_sampler(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _checkpoint(self):
+        """Fold the peaks since the previous checkpoint into every open stage"""
+        self._sample()
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        with self._lock:
+            rss_peak = self._rss_peak
+            self._rss_peak = self.samples[-1][1] if self.samples else 0
+        for stage in self._stack:
+            stage["python_peak"] = max(stage["python_peak"], traced_peak)
+            stage["rss_peak"] = max(stage["rss_peak"], rss_peak)
+
+    def enter(self):
+        self._checkpoint()
+        self._stack.append({"python_peak": 0, "rss_peak": 0})
+
+    def leave(self, snapshot=False):
+        """
+        Close the innermost stage, returning its python_peak / rss_peak in bytes
+
+        With snapshot, the allocation sites still holding the most memory when the stage
+        ends are added as top_allocations ("file:line", bytes).
+        """
+        self._checkpoint()
+        stage = self._stack.pop()
+        if snapshot:
+            filters = [tracemalloc.Filter(False, filename) for filename in self.ignore_files]
+            filters.append(tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"))
+            statistics = tracemalloc.take_snapshot().filter_traces(filters).statistics("lineno")
+            stage["top_allocations"] = [
+                (f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", stat.size)
+                for stat in statistics[:self.top_allocations]
+            ]
+        return stage
@@ -0,0 +1,97 @@
+import gc
+import os
+import threading
+from collections import OrderedDict
+
+# RAM allowed for loaded models across a whole build, in MB; the least recently used ones
+# are unloaded past it (build_scheduler splits it between its worker processes)
+MODEL_BUDGET_ENV = "WC3_MODEL_RAM_BUDGET_MB"
+DEFAULT_MODEL_BUDGET_MB = 3072
+
+def model_nbytes(obj):
+    """Approximate memory of a loaded model: the size of its parameters and buffers"""
+    if isinstance(obj, (tuple, list)):
+        return sum(model_nbytes(item) for item in obj)
+    module = getattr(obj, "model", obj)
+    total = 0
+    for attribute in ("parameters", "buffers"):
+        tensors = getattr(module, attribute, None)
+        if callable(tensors):
+            total += sum(t.numel() * t.element_size() for t in tensors())
+    return total
+
+class ModelPool:
+    """
+    Models loaded once per process and shared by every user of the same name
+
+    Each entry remembers its size; once the total goes over budget_bytes the least
+    recently used models are dropped (the one just requested is always kept).
+    The budget only covers this process: builds running in several processes each
+    get their share of the build budget (see configure_model_pool).
+
+    Args:
+        budget_bytes: Memory allowed for models loaded in this process
+    """
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._models = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, name, loader):
+        """Loaded model for name, calling loader() if it is not in the pool"""
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name][0]
+
+            model = loader()
+            self._models[name] = (model, model_nbytes(model))
+            self._evict(keep=name)
+            return model
+
+    def loaded(self):
+        """Names of the loaded models, least recently used first"""
+        with self._lock:
+            return list(self._models)
+
+    def used_bytes(self):
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+        gc.collect()
+
+    def _evict(self, keep):
+        evicted = False
+        while self.used_bytes() > self.budget_bytes and len(self._models) > 1:
+            name = next(iter(self._models))
+            if name == keep:
+                break
+            del self._models[name]
+            evicted = True
+        if evicted:
+            gc.collect()
+
+_model_pool = None
+
+def model_budget_bytes():
+    """Model RAM budget of a whole build, read from WC3_MODEL_RAM_BUDGET_MB"""
+    try:
+        budget_mb = int(os.environ.get(MODEL_BUDGET_ENV, DEFAULT_MODEL_BUDGET_MB))
+    except ValueError:
+        budget_mb = DEFAULT_MODEL_BUDGET_MB
+    return budget_mb * 1024 * 1024
+
+def configure_model_pool(budget_bytes):
+    """Replace the process-wide ModelPool by an empty one with its own share of the budget"""
+    global _model_pool
+    _model_pool = ModelPool(budget_bytes)
+    return _model_pool
+
+def model_pool():
+    """Process-wide ModelPool, with the whole build budget unless configure_model_pool set a share"""
+    if _model_pool is None:
+        configure_model_pool(model_budget_bytes())
+    return _model_pool
@@ -1,8 +1,13 @@
 import os
 import re
-import shutil
+import json
 from pathlib import Path
 
+from __Misc_Tools.file_transfer.file_transfer import CopyEngine
+from __Misc_Tools.progress_events.progress_events import ProgressThrottle
+from __Misc_Tools.build_trace.build_trace import span
+from __Misc_Tools.tree_walk.tree_walk import walk_files
+
 # === MAPPINGS ===
 REGION_TO_LANGUAGE = {
     "frFR": "French",
@@ -25,16 +30,205 @@ TFT_SCENARIO_MAPS = [
     "(10)Skibi'sCastleTD.w3x", "(12)WormWar.w3x"
 ]
 
-def convert_mpq_to_casc(region_folder_path, progress_callback=None):
+# === MPQ INDEX ===
+MPQ_PRIORITY = {
+    "war3.mpq": 0,
+    "War3x.mpq": 1,
+    "War3xlocal.mpq": 2,
+    "War3Patch.mpq": 3
+}
+
+MPQ_INDEX_VERSION = 2
+
+def mpq_index_path(region_folder):
+    """Location of the persisted file index, stored next to the region MPQ folder"""
+    region_folder = Path(region_folder)
+    return region_folder.parent / f"{region_folder.name}.index.json"
+
+def _scan_mpq_folders(region_folder):
     """
-    Process a single region folder to convert MPQ files to CASC format
-    
+    Walk every MPQ folder of a region and return (dir mtimes, filename -> entries)
+
+    Entries are [file name, directory id, priority], the directory id being the position
+    of the file's folder in the dir mtimes dictionary.
+    """
+    dirs = {".": os.stat(region_folder).st_mtime_ns}
+    files = {}
+
+    for mpq_name, priority in MPQ_PRIORITY.items():
+        folder = region_folder / mpq_name
+        if not folder.exists():
+            continue
+
+        dir_ids = {"": len(dirs)}
+        dirs[mpq_name] = os.stat(folder).st_mtime_ns
+
+        def record_dir(rel_dir, stat, mpq_name=mpq_name, dir_ids=dir_ids):
+            dir_ids[rel_dir] = len(dirs)
+            dirs[f"{mpq_name}/{rel_dir}"] = stat.st_mtime_ns
+
+        for entry in walk_files(folder, on_dir=record_dir):
+            name = entry.path.name
+            files.setdefault(name.lower(), []).append((name, dir_ids[entry.rel_dir], priority))
+
+    return dirs, files
+
+def _index_is_fresh(region_folder, index):
+    """An index stays valid while no directory it recorded was touched"""
+    if index.get("version") != MPQ_INDEX_VERSION or index.get("priority") != MPQ_PRIORITY:
+        return False
+    try:
+        for rel_dir, mtime in index["dirs"].items():
+            if os.stat(region_folder / rel_dir).st_mtime_ns != mtime:
+                return False
+    except OSError:
+        return False
+    return True
+
+class MpqFileIndex:
+    """
+    MPQ files of a region, grouped by lowercase file name
+
+    Each folder is stored once: files are (file name, directory id, priority) records,
+    and a directory id maps to the folder path and to its lowercase parts below the MPQ
+    folder, interned so folders sharing a component share the string. Full paths are only
+    built for the files a conversion actually uses.
+
+    Args:
+        region_folder: Path to the <region>-MPQ folder
+        dir_paths: Folder of each directory id, relative to region_folder
+        files: Dictionary of lowercase filename -> tuple of records
+    """
+    __slots__ = ("region_folder", "dir_paths", "dir_parts", "files")
+
+    def __init__(self, region_folder, dir_paths, files):
+        self.region_folder = Path(region_folder)
+        self.dir_paths = dir_paths
+        components = {}
+        # First part is the MPQ folder itself
+        self.dir_parts = [
+            tuple(components.setdefault(part, part) for part in rel_dir.lower().split("/")[1:])
+            for rel_dir in dir_paths
+        ]
+        self.files = files
+
+    def __len__(self):
+        return len(self.files)
+
+    def items(self):
+        return self.files.items()
+
+    def parts(self, record):
+        """Lowercase parent folders of a record, below its MPQ folder"""
+        return self.dir_parts[record[1]]
+
+    def source_path(self, record):
+        """Full path of the file a record stands for"""
+        name, dir_id, _ = record
+        return self.region_folder / self.dir_paths[dir_id] / name
+
+def load_mpq_index(region_folder, progress_callback=None):
+    """
+    Return the MPQ file index of a region, rebuilding it only when the tree changed
+
+    Args:
+        region_folder: Path to the <region>-MPQ folder
+        progress_callback: Function to call with progress updates (optional)
+
+    Returns:
+        MpqFileIndex of the region
+    """
+    region_folder = Path(region_folder)
+    index_file = mpq_index_path(region_folder)
+
+    index = None
+    if index_file.exists():
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = None
+
+    if index is not None and _index_is_fresh(region_folder, index):
+        if progress_callback:
+            progress_callback("  | 🗂️ Reusing MPQ file index (no changes detected)")
+    else:
+        if progress_callback:
+            progress_callback("  | 🗂️ Indexing MPQ folders...")
+        dirs, files = _scan_mpq_folders(region_folder)
+        index = {
+            "version": MPQ_INDEX_VERSION,
+            "priority": MPQ_PRIORITY,
+            "dirs": dirs,
+            "files": files,
+        }
+        try:
+            tmp_file = index_file.with_name(index_file.name + ".tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            os.replace(tmp_file, index_file)
+        except OSError as e:
+            if progress_callback:
+                progress_callback(f"  | ⚠️ Could not save MPQ file index: {str(e)}")
+
+    return mpq_file_index(region_folder, index)
+
+def mpq_file_index(region_folder, index):
+    """MpqFileIndex of a scanned or persisted index ("dirs" and "files" entries)"""
+    files = {
+        file_lower: tuple(tuple(entry) for entry in entries)
+        for file_lower, entries in index["files"].items()
+    }
+    return MpqFileIndex(region_folder, list(index["dirs"]), files)
+
+def build_resolution_index(mpq_files):
+    """
+    Precompute the best source for every (filename, parent-prefix) key
+
+    A CASC path is matched against the candidate sharing the longest leading run of
+    parent folders, ties going to the highest MPQ priority (then to the first one indexed).
+    Storing the winner of every prefix of every candidate turns that search into a few
+    dictionary lookups per CASC path.
+    """
+    # The prefixes of a folder are shared by every key built from its files
+    prefixes = [
+        [parts[:depth] for depth in range(len(parts) + 1)]
+        for parts in mpq_files.dir_parts
+    ]
+    index = {}
+    for file_lower, candidates in mpq_files.items():
+        for candidate in candidates:
+            priority = candidate[2]
+            for prefix in prefixes[candidate[1]]:
+                key = (file_lower, prefix)
+                current = index.get(key)
+                if current is None or priority > current[2]:
+                    index[key] = candidate
+    return index
+
+def resolve_casc_path(resolution_index, rel_path):
+    """Return the best MpqFileIndex record for a CASC path, or None"""
+    target_path = Path(rel_path.replace("\\", "/"))
+    filename = target_path.name.lower()
+    parent_dirs = tuple(p.lower() for p in target_path.parent.parts)
+
+    for depth in range(len(parent_dirs), -1, -1):
+        candidate = resolution_index.get((filename, parent_dirs[:depth]))
+        if candidate is not None:
+            return candidate
+    return None
+
+def plan_mpq_to_casc(region_folder_path, progress_callback=None):
+    """
+    Resolve which MPQ file feeds every CASC path of a region, without copying anything
+
     Args:
         region_folder_path: Full path to the region folder
         progress_callback: Function to call with progress updates (optional)
 
     Returns:
-        Dictionary with processing results
+        Dictionary with the {relative CASC path: source file} manifest and counters,
+        or False if the region cannot be converted
     """
     region_folder = Path(region_folder_path)
 
@@ -46,44 +240,16 @@ def convert_mpq_to_casc(region_folder_path, progress_callback=None):
     
     # Validate folder name format
     if not re.match(r'^[a-z]{2}[A-Z]{2}-MPQ$', region_folder.name):
-        error_msg = f"Invalid folder format: {region_folder.name}"
         progress_callback(f"  - ⚠️ Folder path is incorrect: {region_folder}")
         progress_callback(f"⛔ Patching has stopped for region {region_code}")
         return False
 
     script_dir = Path(__file__).resolve().parent
-    output_folder = region_folder.parent / f"{region_folder.name}-converted-to-CASC"
-    
-    mpq_folders = [
-        region_folder / "war3.mpq",
-        region_folder / "War3x.mpq",
-        region_folder / "War3xlocal.mpq",
-        region_folder / "War3Patch.mpq"
-    ]
-
-    MPQ_PRIORITY = {
-        "war3.mpq": 0,
-        "War3x.mpq": 1,
-        "War3xlocal.mpq": 2,
-        "War3Patch.mpq": 3
-    }
     
-    mpq_files = {}
-    for folder in mpq_folders:
-        if not folder.exists():
-            continue
-        
-        priority = MPQ_PRIORITY.get(folder.name, 0)
-        
-        for root, _, files in os.walk(folder):
-            for file in files:
-                file_lower = file.lower()
-                rel_path = Path(root).relative_to(folder)
-                path_parts = [p.lower() for p in rel_path.parts]
-                
-                if file_lower not in mpq_files:
-                    mpq_files[file_lower] = []
-                mpq_files[file_lower].append((Path(root) / file, path_parts, priority))
+    with span("mpq_index"):
+        mpq_files = load_mpq_index(region_folder, progress_callback)
+    with span("resolution_index", files=len(mpq_files)):
+        resolution_index = build_resolution_index(mpq_files)
 
     casc_structure_file = script_dir / "structure.txt"
     if not casc_structure_file.exists():
@@ -94,99 +260,109 @@ def convert_mpq_to_casc(region_folder_path, progress_callback=None):
     with open(casc_structure_file, 'r', encoding='utf-8') as f:
         required_paths = [line.strip() for line in f if line.strip()]
 
-    copied = 0
+    manifest = {}
     missing = 0
-    total_files = len(required_paths)
     
-    progress_callback(f"  | 📝 Copying files... 0/{total_files} (0%)")
-    
-    for i, rel_path in enumerate(required_paths):
-        if progress_callback and (i % 10 == 0 or i == total_files - 1):
-            percent = int((i + 1) / total_files * 100)
-            progress_callback(f"  | 📝 Copying files... {i+1}/{total_files} ({percent}%)")
-        
-        target_path = Path(rel_path)
-        filename = target_path.name.lower()
-        parent_dirs = [p.lower() for p in target_path.parent.parts]
-        output_path = output_folder / rel_path
-        
-        candidates = mpq_files.get(filename, [])
-        best_candidate = None
-        best_score = -1
-        best_priority = -1
-        
-        for full_path, parts, priority in candidates:
-            score = 0
-            for i, (a, b) in enumerate(zip(parent_dirs, parts)):
-                if a == b:
-                    score += 1
-                else:
-                    break
-                    
-            if (score > best_score or 
-                (score == best_score and priority > best_priority)):
-                best_candidate = (full_path, parts, priority)
-                best_score = score
-                best_priority = priority
-                
-        if best_candidate:
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(best_candidate[0], output_path)
-            copied += 1
-        else:
-            missing += 1
-
-    maps_copied = 0
+    with span("resolve_structure", paths=len(required_paths)):
+        for rel_path in required_paths:
+            best_candidate = resolve_casc_path(resolution_index, rel_path)
+            if best_candidate:
+                manifest[Path(rel_path.replace("\\", "/"))] = mpq_files.source_path(best_candidate)
+            else:
+                missing += 1
+
+    resolved = len(manifest)
+    maps_found = 0
     war3x_mpq_folder = region_folder / "war3x.mpq"
     
-    maps_dest = output_folder / "maps" / f"{language_name} Maps Patch (1.27 backup)"
+    maps_dest = Path("maps") / f"{language_name} Maps Patch (1.27 backup)"
     roc_scenario_dest = maps_dest / "Scenario"
     frozen_throne_dest = maps_dest / "FrozenThrone"
     tft_scenario_dest = frozen_throne_dest / "Scenario"
     
-    for folder in [maps_dest, roc_scenario_dest, frozen_throne_dest, tft_scenario_dest]:
-        folder.mkdir(parents=True, exist_ok=True)
-    
     for map_file in war3x_mpq_folder.glob("*.w3m"):
         map_name = map_file.name
         dest_path = roc_scenario_dest / map_name if map_name in ROC_SCENARIO_MAPS else maps_dest / map_name
-        shutil.copy2(map_file, dest_path)
-        maps_copied += 1
+        manifest[dest_path] = map_file
+        maps_found += 1
     
     for map_file in war3x_mpq_folder.glob("*.w3x"):
         map_name = map_file.name
         dest_path = tft_scenario_dest / map_name if map_name in TFT_SCENARIO_MAPS else frozen_throne_dest / map_name
-        shutil.copy2(map_file, dest_path)
-        maps_copied += 1
+        manifest[dest_path] = map_file
+        maps_found += 1
 
-    # === COPY EXTRA CAMPAIGN MAPS ===
+    # === EXTRA CAMPAIGN MAPS ===
 
     # 1. From war3.mpq\Maps\Campaign\*.w3m to maps/
     war3_campaign_folder = region_folder / "war3.mpq" / "Maps" / "Campaign"
     if war3_campaign_folder.exists():
-        maps_dir = output_folder / "maps" / "campaign"
-        maps_dir.mkdir(parents=True, exist_ok=True)
+        maps_dir = Path("maps") / "campaign"
         for map_file in war3_campaign_folder.glob("*.w3m"):
-            shutil.copy2(map_file, maps_dir / map_file.name)
-            maps_copied += 1
+            manifest[maps_dir / map_file.name] = map_file
+            maps_found += 1
 
     # 2. From War3xlocal.mpq\Maps\FrozenThrone\Campaign\*.w3x to maps/FrozenThrone/Campaign/
     tft_campaign_folder = region_folder / "War3xlocal.mpq" / "Maps" / "FrozenThrone" / "Campaign"
-    tft_campaign_dest = output_folder / "maps" / "FrozenThrone" / "Campaign"
+    tft_campaign_dest = Path("maps") / "FrozenThrone" / "Campaign"
     if tft_campaign_folder.exists():
-        tft_campaign_dest.mkdir(parents=True, exist_ok=True)
         for map_file in tft_campaign_folder.glob("*.w3x"):
-            shutil.copy2(map_file, tft_campaign_dest / map_file.name)
-            maps_copied += 1
+            manifest[tft_campaign_dest / map_file.name] = map_file
+            maps_found += 1
 
-    result = {
+    return {
         "region": region_folder.name,
-        "copied_files": copied,
+        "manifest": manifest,
+        "resolved_files": resolved,
         "missing_files": missing,
-        "copied_maps": maps_copied,
+        "found_maps": maps_found,
+        "output_folder": str(region_folder.parent / f"{region_folder.name}-converted-to-CASC")
+    }
+
+def convert_mpq_to_casc(region_folder_path, progress_callback=None, transfer_mode="auto", skip_unchanged=False):
+    """
+    Process a single region folder to convert MPQ files to CASC format
+    
+    Args:
+        region_folder_path: Full path to the region folder
+        progress_callback: Function to call with progress updates (optional)
+        transfer_mode: How files are placed in the output folder (see file_transfer.transfer_file)
+        skip_unchanged: Keep output files whose size and mtime still match their source
+
+    Returns:
+        Dictionary with processing results
+    """
+    with span("plan_mpq_to_casc"):
+        plan = plan_mpq_to_casc(region_folder_path, progress_callback)
+    if not plan:
+        return False
+
+    output_folder = Path(plan["output_folder"])
+    manifest = plan["manifest"]
+    total_files = len(manifest)
+    
+    progress = ProgressThrottle(progress_callback, "convert", "  | 📝 Copying files", total_files)
+    progress.update(0)
+
+    engine = CopyEngine(transfer_mode=transfer_mode, skip_unchanged=skip_unchanged)
+    with span("copy", files=total_files):
+        errors = engine.copy(
+            ((src, output_folder / rel_path) for rel_path, src in manifest.items()),
+            progress=lambda done, total: progress.update(done), progress_every=1
+        )
+    for src, e in errors:
+        progress_callback(f"  - ⚠️ Error copying {src}: {str(e)}")
+
+    progress_callback(f"  | 🔗 Transfers: {engine.stats.summary()}")
+    result = {
+        "region": plan["region"],
+        "copied_files": plan["resolved_files"],
+        "missing_files": plan["missing_files"],
+        "copied_maps": plan["found_maps"],
+        "copy_errors": len(errors),
         "output_folder": str(output_folder)
     }
     
     progress_callback(f"  | ✅ MPQ data converted to CASC format")
     
-    return result
\ No newline at end of file
+    return result
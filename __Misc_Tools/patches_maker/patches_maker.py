@@ -1,18 +1,145 @@
 import shutil
 from pathlib import Path
-from zipfile import ZipFile
 import os
 import re
 import logging
+from contextlib import nullcontext, contextmanager
 from datetime import datetime
 
 # Import translator functions directly
-from __Misc_Tools.campaignstrings_translator.campaign_strings_translator import *
-from __Misc_Tools.worldeditor_translator.worldeditor_translator import *
-from __Misc_Tools.wc3keys_translater.wc3keys_translater import *
+from __Misc_Tools.campaignstrings_translator.campaign_strings_translator import convert_campaign_strings, parse_campaign_template
+from __Misc_Tools.worldeditor_translator.worldeditor_translator import (
+    WorldEditorTranslator, translator_config, load_localization_file, DEFAULT_BATCH_SIZE
+)
+from __Misc_Tools.wc3keys_translater.wc3keys_translater import translate_fdf, fdf_translator_config, parse_fdf
+from __Misc_Tools.mpq_to_casc_converter.mpq_to_casc_converter import plan_mpq_to_casc, convert_mpq_to_casc
+from __Misc_Tools.build_cache.build_cache import BuildCache
+from __Misc_Tools.template_cache.template_cache import shared_templates
+from __Misc_Tools.file_transfer.file_transfer import CopyEngine, write_text_file, UNCHANGED
+from __Misc_Tools.zip_writer.zip_writer import ParallelZipWriter
+from __Misc_Tools.progress_events.progress_events import ProgressThrottle
+from __Misc_Tools.build_trace.build_trace import span, trace_region
+from __Misc_Tools.tree_walk.tree_walk import walk_files, list_files, file_stat, walk_memo
+from __Misc_Tools.model_pool.model_pool import model_pool
+from __Misc_Tools.translation_memory.translation_memory import shared_memory, memory_path
 
-def build_patch_for_region(progress_callback, mpq_to_casc_path):
-    """Create patch for a single region with enhanced region code handling"""
+# English templates ship with the tools, wherever the build's base folder is
+TOOLS_DIR = Path(__file__).resolve().parent.parent
+WORLDEDITOR_TEMPLATE_DIR = TOOLS_DIR / "worldeditor_translator"
+GLOBALSTRINGS_TEMPLATE = TOOLS_DIR / "wc3keys_translater" / "globalstrings_template.fdf"
+CAMPAIGN_STRINGS_TEMPLATE = TOOLS_DIR / "campaignstrings_translator" / "template_1.31.txt"
+
+# Top-level entries kept in a region patch, everything else is cleaned out
+CLEAN_ALLOWED_DIRS = {"maps", "movies", "sound", "ui", "units", "campaign", "fonts"}
+CLEAN_ALLOWED_FILES = {"war3patch.txt"}
+
+# World editor UI files translated against their English template
+WORLDEDITOR_UI_FILES = [
+    ("worldeditgamestrings_template.txt", "worldeditgamestrings.txt"),
+    ("worldeditstrings_template.txt", "worldeditstrings.txt")
+]
+
+GLOBALSTRINGS_FDF = Path("ui") / "framedef" / "globalstrings.fdf"
+
+class _UnlimitedStages:
+    """Stage limits of a build running on its own"""
+    io = nullcontext()
+    translation = nullcontext()
+
+NO_STAGE_LIMITS = _UnlimitedStages()
+
+@contextmanager
+def translation_stage(stage_limits):
+    """
+    Hold a translation slot of stage_limits for the enclosed block
+
+    Models loaded meanwhile are unloaded from the process model pool before the slot is
+    given back, so a worker moving on to its next region does not keep them resident:
+    only regions holding a slot have models in memory.
+    """
+    with stage_limits.translation:
+        try:
+            yield
+        finally:
+            model_pool().clear()
+
+def build_region(mpq_path, progress_callback, stream_to_zip=False, stage_limits=NO_STAGE_LIMITS,
+                 transfer_mode="auto", skip_unchanged=False, batch_size=None):
+    """Convert (unless streaming) and build the patch of one region folder
+
+    With skip_unchanged, staged files left by a previous (interrupted) build are kept when
+    their size and mtime still match the source, instead of being copied again.
+    batch_size sets how many strings go to the translation model per call
+    (defaults to worldeditor_translator.DEFAULT_BATCH_SIZE).
+
+    With tracing enabled (see build_trace.trace_region), the timings of every stage are
+    written as a Chrome/Perfetto trace once the build ends.
+    """
+    region_code = Path(mpq_path).name.split('-')[0]
+    # Source trees are walked once per build, even though the reuse check plans them too
+    with trace_region(region_code, progress_callback), walk_memo():
+        return _build_region(mpq_path, region_code, progress_callback, stream_to_zip, stage_limits, transfer_mode,
+                             skip_unchanged, batch_size)
+
+def _build_region(mpq_path, region_code, progress_callback, stream_to_zip, stage_limits, transfer_mode,
+                  skip_unchanged, batch_size):
+    cache = None
+    build_key = None
+    if not stream_to_zip:
+        # Skip the conversion entirely when nothing changed since the last build
+        cache = BuildCache(Path(mpq_path).parent.parent / "merged" / ".build_cache", region_code)
+        with span("reuse_check"):
+            reusable_zip, build_key = find_reusable_patch(mpq_path, cache)
+        if reusable_zip:
+            progress_callback(f"🚀 Starting patch creation for: {region_code}")
+            progress_callback(f"  | ♻️ Inputs unchanged, reusing archive: {reusable_zip.name}")
+            progress_callback(f"✅ Successfully created patch for: {region_code}")
+            return True
+
+        with stage_limits.io, span("convert_mpq_to_casc"):
+            conversion = convert_mpq_to_casc(region_folder_path=mpq_path, progress_callback=progress_callback,
+                                             transfer_mode=transfer_mode, skip_unchanged=skip_unchanged)
+        if not conversion:
+            return False
+        if conversion["copy_errors"]:
+            # The converted folder no longer matches its sources, key it by what it holds
+            build_key = None
+
+    return build_patch_for_region(
+        progress_callback=progress_callback,
+        mpq_to_casc_path=str(mpq_path) + "-converted-to-CASC",
+        stream_to_zip=stream_to_zip,
+        stage_limits=stage_limits,
+        transfer_mode=transfer_mode,
+        skip_unchanged=skip_unchanged,
+        cache=cache,
+        build_key=build_key,
+        batch_size=batch_size,
+    )
+
+def build_patch_for_region(progress_callback, mpq_to_casc_path, stream_to_zip=False, stage_limits=NO_STAGE_LIMITS,
+                           transfer_mode="auto", skip_unchanged=False, cache=None, build_key=None,
+                           batch_size=None):
+    """Create patch for a single region with enhanced region code handling
+
+    With stream_to_zip, the MPQ data is not expected to be converted beforehand: every
+    resolved source is written straight into the patch zip and translated UI files are
+    generated in memory, so no staging folder is created.
+
+    stage_limits bounds how many concurrent builds may run their I/O-heavy and
+    translation stages at once (see build_scheduler.StageLimits).
+
+    transfer_mode selects how files are placed in the patch folder (see
+    file_transfer.transfer_file); outputs are never modified in place, so hardlinks
+    back to the source data stay safe. skip_unchanged keeps patch folder files that
+    already match their source (see copy_manifest).
+
+    cache and build_key come from a reuse check already made against the MPQ sources
+    (see find_reusable_patch): the build is then recorded under that key, without
+    hashing the converted copies again.
+
+    batch_size is the number of strings per translation model call (see build_region).
+    """
     try:
         # Convert to Path object and get base directory
         MPQ_DATA_TO_CASC = Path(mpq_to_casc_path)
@@ -41,100 +168,323 @@ def build_patch_for_region(progress_callback, mpq_to_casc_path):
         if not region_code:
             return False
         
+        if cache is None:
+            cache = BuildCache(MERGED / ".build_cache", region_code)
+
+        if stream_to_zip:
+            return stream_patch_for_region(progress_callback, MPQ_DATA_TO_CASC, region_code, base_dir, stage_limits, cache,
+                                           batch_size)
+
+        # Steps 1-4: Resolve every layer into one manifest
+        manifest = plan_region_manifest(MPQ_DATA_TO_CASC, region_code, base_dir, progress_callback)
+
+        # Reuse the previous archive if no input changed since it was built
+        if build_key is None:
+            with span("build_key", files=len(manifest)):
+                build_key = region_build_key(cache, manifest, region_code)
+            reusable_zip = cache.reusable_zip(build_key)
+            if reusable_zip:
+                progress_callback(f"  | ♻️ Inputs unchanged, reusing archive: {reusable_zip.name}")
+                shutil.rmtree(MPQ_DATA_TO_CASC, ignore_errors=True)
+                progress_callback(f"✅ Successfully created patch for: {region_code}")
+                return True
+
         # Create region-specific patch folder
         region_patch_folder = MERGED / f"{region_code}_patch"
         region_patch_folder.mkdir(exist_ok=True)
+
+        # Copy each output once
+        with stage_limits.io:
+            copy_manifest(
+                manifest, region_patch_folder,
+                label=f"  | 📝 Copying patch files ({region_code})",
+                progress_callback=progress_callback,
+                transfer_mode=transfer_mode,
+                skip_unchanged=skip_unchanged
+            )
+
+            # Step 5: Clean leftovers of previous builds
+            clean_folder(region_patch_folder, progress_callback)
+
+        # Steps 7-8: Translate world editor UI files and globalstrings.fdf
+        with translation_stage(stage_limits):
+            patch_files = {rel_path: region_patch_folder / rel_path for rel_path in manifest}
+            with span("translate"):
+                generated, translated = render_translated_files(patch_files, region_code, progress_callback, cache, batch_size)
+            with span("write_translations", files=len(generated)):
+                for rel_path, content in generated.items():
+                    write_text_file(region_patch_folder / rel_path, content)
+
+        # Step 9 Deleted the "converted-to-CASC" folder
+        with span("remove_converted"):
+            shutil.rmtree(MPQ_DATA_TO_CASC)
+        progress_callback(f"  | ✅ Removed temporary folder: {MPQ_DATA_TO_CASC.name}")
+
+        # Step 10: Package final patch
+        with stage_limits.io:
+            zip_path = zip_and_remove(region_patch_folder, progress_callback)
+        # An archive with untranslated strings is rebuilt next time instead of reused
+        if zip_path and translated:
+            cache.record_build(build_key, zip_path)
+        else:
+            cache.save()
         
-        # Step 1: Copy MPQ_converted_to_CASC data (excluding sound)
-        copy_contents(
-            MPQ_DATA_TO_CASC, region_patch_folder, 
-            skip_sound=True, 
-            label=f"  | 📝 Copying MPQ_to_CASC files ...",
-            progress_callback=progress_callback
-        )
+        progress_callback(f"✅ Successfully created patch for: {region_code}")
+        return True
         
-        # Step 2: Copy CASC data (including sound, excluding maps)
-        casc_region_folder = CASC_DATA / f"{region_code}.w3mod"
+    except Exception as e:
+        progress_callback(f"  | ⛔ Critical error creating patch: {str(e)}")
+        logging.exception("Patch creation failed")
+        return False
+
+def stream_patch_for_region(progress_callback, mpq_to_casc_path, region_code, base_dir,
+                            stage_limits=NO_STAGE_LIMITS, cache=None, batch_size=None):
+    """Build a region patch zip directly from the MPQ, CASC and HomeMade sources"""
+    region_folder = Path(str(mpq_to_casc_path).removesuffix("-converted-to-CASC"))
+
+    with span("plan_mpq_to_casc"):
+        plan = plan_mpq_to_casc(region_folder, progress_callback)
+    if not plan:
+        return False
+    progress_callback(f"  | ✅ Resolved {plan['resolved_files']} MPQ files and {plan['found_maps']} maps")
+
+    manifest = plan_region_manifest(plan["manifest"], region_code, base_dir, progress_callback)
+
+    if cache:
+        with span("build_key", files=len(manifest)):
+            build_key = region_build_key(cache, manifest, region_code)
+        reusable_zip = cache.reusable_zip(build_key)
+        if reusable_zip:
+            progress_callback(f"  | ♻️ Inputs unchanged, reusing archive: {reusable_zip.name}")
+            progress_callback(f"✅ Successfully created patch for: {region_code}")
+            return True
+
+    with translation_stage(stage_limits):
+        with span("translate"):
+            generated, translated = render_translated_files(manifest, region_code, progress_callback, cache, batch_size)
+
+    zip_path = available_zip_path(base_dir / "merged" / f"{region_code}_patch.zip")
+    with stage_limits.io:
+        if not zip_manifest(manifest, generated, zip_path, progress_callback):
+            return False
+
+    if cache and translated:
+        cache.record_build(build_key, zip_path)
+    elif cache:
+        cache.save()
+
+    progress_callback(f"✅ Successfully created patch for: {region_code}")
+    return True
+
+def _translation_templates():
+    """English templates the translated outputs of a region depend on"""
+    templates = [WORLDEDITOR_TEMPLATE_DIR / template_file for template_file, _ in WORLDEDITOR_UI_FILES]
+    templates.append(GLOBALSTRINGS_TEMPLATE)
+    return templates
+
+def region_build_key(cache, manifest, region_code):
+    """Content key of everything a region patch is built from"""
+    config = {
+        "worldeditor": translator_config(region_code),
+        "fdf": fdf_translator_config(region_code),
+    }
+    return cache.build_key(manifest, _translation_templates(), config)
+
+def find_reusable_patch(mpq_path, cache):
+    """
+    Check the inputs of a region against the last build recorded in cache
+
+    Returns (existing patch zip or None, build key of the current inputs); the key is
+    None when the region cannot be planned. Pass the same cache on to the build so the
+    digests hashed here are saved with it.
+    """
+    region_folder = Path(mpq_path)
+    base_dir = region_folder.parent.parent
+    silent = lambda message: None
+
+    region_code = extract_region_code(Path(f"{region_folder}-converted-to-CASC"), silent)
+    if not region_code:
+        return None, None
+
+    plan = plan_mpq_to_casc(region_folder, silent)
+    if not plan:
+        return None, None
+
+    manifest = plan_region_manifest(plan["manifest"], region_code, base_dir, silent)
+    build_key = region_build_key(cache, manifest, region_code)
+    return cache.reusable_zip(build_key), build_key
+
+def plan_region_manifest(mpq_source, region_code, base_dir, progress_callback):
+    """
+    Resolve the overlay layers of a region into a {relative path: source} manifest
+
+    Layers, in override order:
+        1. MPQ_converted_to_CASC data (excluding sound)
+        2. CASC data (including sound, excluding maps)
+        3. MPQ_converted_to_CASC sound files (to override CASC)
+        4. HomeMade overrides
+
+    mpq_source is either the converted folder or the manifest returned by plan_mpq_to_casc.
+    """
+    with span("plan_manifest"):
+        with span("layer mpq"):
+            if isinstance(mpq_source, dict):
+                mpq_files = mpq_source
+            else:
+                mpq_files = collect_layer(mpq_source)
+
+            layers = [{rel: src for rel, src in mpq_files.items() if not _is_filtered_out(rel, skip_sound=True)}]
+
+        casc_region_folder = base_dir / "CASC_Data" / f"{region_code}.w3mod"
         if casc_region_folder.exists() and casc_region_folder.is_dir():
-            copy_contents(
-                casc_region_folder, region_patch_folder, 
-                skip_w3x=True, 
-                label=f"  | 📝 Copying CASC files ...",
-                progress_callback=progress_callback
-            )
+            with span("layer casc"):
+                layers.append(collect_layer(casc_region_folder, skip_w3x=True))
         else:
             progress_callback(f"  | ⚠️ CASC data not found for {region_code} at: {casc_region_folder}")
             progress_callback("  | ℹ️ Proceeding without CASC data...")
 
-        
-        # Step 3: Copy MPQ_converted_to_CASC sound files (to override CASC)
-        copy_contents(
-            MPQ_DATA_TO_CASC, region_patch_folder, 
-            only_sound=True, 
-            label=f"  | 🔊 Overriding Sound with MPQ's for ({region_code})",
-            progress_callback=progress_callback
-        )
-        
-        # Step 4: Apply homemade overrides
-        homemade_folder = find_homemade_folder(region_code, HOMEMADE_DATA)
+        with span("layer mpq sound"):
+            layers.append({rel: src for rel, src in mpq_files.items() if not _is_filtered_out(rel, only_sound=True)})
+
+        homemade_folder = find_homemade_folder(region_code, base_dir / "_HomeMade_Data")
         if homemade_folder:
-            copy_contents(
-                homemade_folder, region_patch_folder, 
-                label=f"HomeMade ({region_code})",
-                progress_callback=progress_callback
-            )
+            with span("layer homemade"):
+                layers.append(collect_layer(homemade_folder))
         else:
             progress_callback(f"  | ℹ️ No HomeMade data found for {region_code}")
-        
-        # Step 5: Clean unnecessary files
-        clean_folder(region_patch_folder, progress_callback)
-                
-        # Step 7: Process world editor UI files
-        run_worldeditor_translator(region_patch_folder, region_code, base_dir, progress_callback)
 
-        # New Step 8: Translate globalstrings.fdf
+        with span("overlay", layers=len(layers)):
+            return plan_overlay(layers)
+
+def render_translated_files(manifest, region_code, progress_callback, cache=None, batch_size=None):
+    """Translate the UI files of a manifest in memory, returning ({relative path: content}, complete)
+
+    With a BuildCache, a file whose template, source and translator settings are unchanged
+    reuses its previous translation instead of running the translator again.
+    Templates are parsed once per process (and kept next to the build cache on disk), and
+    the translation memory of the build lives in the build cache folder.
+
+    complete is False when a file could not be translated or kept some strings untranslated;
+    such output is never stored in the cache, and the build should not be recorded either.
+    """
+    generated = {}
+    complete = True
+    templates = shared_templates(cache.cache_dir / "templates" if cache else None)
+    memory = shared_memory(memory_path(cache.cache_dir) if cache else None)
+
+    ui_sources = {}
+    for template_file, target_file in WORLDEDITOR_UI_FILES:
+        src = manifest.get(Path("ui") / target_file)
+        if src is None:
+            progress_callback(f"  | ⚠️ Target file not found: ui/{target_file}")
+            continue
+        template_path = WORLDEDITOR_TEMPLATE_DIR / template_file
+        if not template_path.exists():
+            progress_callback(f"  | ⚠️ Template file not found: {template_path}")
+            continue
+        ui_sources[target_file] = (template_path, src)
+
+    # The translation model is only loaded once a file actually needs it
+    translator = None
+    for target_file, (template_path, src) in ui_sources.items():
         try:
-            progress_callback("  | 🔤 Translating globalstrings.fdf...")
-            
-            # Path to the English template
-            english_fdf_template = base_dir / "__Misc_Tools" / "wc3keys_translater" / "globalstrings_template.fdf"
-            
-            # Path to the language-specific FDF in the patch
-            language_fdf = region_patch_folder / "ui" / "framedef" / "globalstrings.fdf"
-            
-            # Only process if both files exist
-            if english_fdf_template.exists() and language_fdf.exists():
-              
-                # Perform the translation
-                translate_fdf(
-                    english_fdf_template_path=english_fdf_template,
-                    language_fdf_path=language_fdf,
-                    output_path=language_fdf  # overwrite the original
-                )
-                progress_callback("  | ✅ Translated globalstrings.fdf")
-            else:
-                if not english_fdf_template.exists():
-                    progress_callback(f"  | ⚠️ English template not found: {english_fdf_template}")
-                if not language_fdf.exists():
-                    progress_callback(f"  | ⚠️ Language FDF not found: {language_fdf}")
+            with span(f"translate {target_file}"):
+                key = cache.translation_key(template_path, src, translator_config(region_code)) if cache else None
+                content = cache.translation(key) if cache else None
+                if content is not None:
+                    progress_callback(f"  | ♻️ Reusing cached translation of {target_file} for {region_code}")
+                else:
+                    if translator is None:
+                        translator = WorldEditorTranslator(region_code, progress_callback,
+                                                           batch_size=batch_size or DEFAULT_BATCH_SIZE, memory=memory)
+                    progress_callback(f"  | 🌍 Translating {target_file} for {region_code}")
+                    template = templates.get(template_path, load_localization_file)
+                    failures = translator.failures
+                    content = translator.process_file(str(template_path), str(src), write=False, template=template)
+                    if translator.failures > failures:
+                        complete = False
+                        progress_callback(f"  | ⚠️ {translator.failures - failures} strings of {target_file} left untranslated")
+                    elif cache:
+                        cache.store_translation(key, content)
+                    progress_callback(f"  | ✅ Translated {target_file} for {region_code}")
+            generated[Path("ui") / target_file] = content
         except Exception as e:
-            progress_callback(f"  | ❌ Error translating globalstrings.fdf: {str(e)}")
+            complete = False
+            progress_callback(f"  | ⛔ Failed to translate {target_file}: {str(e)}")
 
-        # Step 9 Deleted the "converted-to-CASC" folder
-        shutil.rmtree(MPQ_DATA_TO_CASC)
-        progress_callback(f"  | ✅ Removed temporary folder: {MPQ_DATA_TO_CASC.name}")
+    try:
+        progress_callback("  | 🔤 Translating globalstrings.fdf...")
+        english_fdf_template = GLOBALSTRINGS_TEMPLATE
+        language_fdf = manifest.get(GLOBALSTRINGS_FDF)
 
-        # Step 10: Package final patch
-        zip_and_remove(region_patch_folder, progress_callback)
-        
-        progress_callback(f"✅ Successfully created patch for: {region_code}")
-        return True
-        
+        if english_fdf_template.exists() and language_fdf is not None:
+            with span("translate globalstrings.fdf"):
+                key = cache.translation_key(english_fdf_template, language_fdf, fdf_translator_config(region_code)) if cache else None
+                content = cache.translation(key) if cache else None
+                if content is None:
+                    failed_keys = []
+                    content = translate_fdf(
+                        english_fdf_template_path=english_fdf_template,
+                        language_fdf_path=language_fdf,
+                        template=templates.get(english_fdf_template, parse_fdf),
+                        region_code=region_code,
+                        memory=memory,
+                        on_error=lambda key, e: failed_keys.append(key)
+                    )
+                    if failed_keys:
+                        complete = False
+                        progress_callback(f"  | ⚠️ {len(failed_keys)} globalstrings.fdf keys left in English")
+                    elif cache:
+                        cache.store_translation(key, content)
+            generated[GLOBALSTRINGS_FDF] = content
+            progress_callback("  | ✅ Translated globalstrings.fdf")
+        else:
+            if not english_fdf_template.exists():
+                progress_callback(f"  | ⚠️ English template not found: {english_fdf_template}")
+            if language_fdf is None:
+                progress_callback(f"  | ⚠️ Language FDF not found: {GLOBALSTRINGS_FDF.as_posix()}")
     except Exception as e:
-        progress_callback(f"  | ⛔ Critical error creating patch: {str(e)}")
-        logging.exception("Patch creation failed")
+        complete = False
+        progress_callback(f"  | ❌ Error translating globalstrings.fdf: {str(e)}")
+
+    return generated, complete
+
+def available_zip_path(zip_path):
+    """Return zip_path, or a timestamped sibling if an archive already exists there"""
+    if zip_path.exists():
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        zip_path = zip_path.with_name(f"{zip_path.stem}_{timestamp}.zip")
+    return zip_path
+
+def zip_manifest(manifest, generated, zip_path, progress_callback):
+    """Write manifest sources (or their generated replacement) straight into a zip archive"""
+    progress_callback(f"  | 📦 Creating archive: {zip_path.name}")
+
+    total_files = len(manifest)
+    if not total_files:
+        progress_callback("  | ⚠️ Nothing to zip | no source files resolved")
         return False
 
+    progress = ProgressThrottle(progress_callback, "zip", "  |   |   Zipping", total_files)
+    try:
+        with span("zip", files=total_files), ParallelZipWriter(zip_path) as zipf:
+            for processed, (rel_path, src) in enumerate(manifest.items(), 1):
+                arcname = rel_path.as_posix()
+                if rel_path in generated:
+                    # Dated like the file it replaces, so rebuilds of the same inputs match
+                    zipf.add_bytes(arcname, generated[rel_path].encode('utf-8'), mtime=file_stat(src).st_mtime)
+                else:
+                    zipf.add_file(src, arcname, stat=file_stat(src))
+                progress.update(processed)
+    except Exception as e:
+        progress_callback(f"  | ⛔ Zip creation failed: {str(e)}")
+        if zip_path.exists():
+            zip_path.unlink()
+        return False
+
+    progress_callback(f"  | 📦 Archive created: {zip_path.name} ({zip_path.stat().st_size//1024} KB)")
+    return True
+
 def extract_region_code(MPQ_DATA_TO_CASC, progress_callback):
     """Extract region code from MPQ folder path in aaBB format"""
     pattern = r"[\\/]([a-zA-Z]{4})[-_]"
@@ -151,9 +501,92 @@ def skip_w3m_w3x_folder(path: Path):
     """Check if path should be skipped as map folder"""
     return any(part.endswith((".w3x", ".w3m")) for part in path.parts)
 
+def _is_filtered_out(rel_path, skip_w3x=False, skip_sound=False, only_sound=False):
+    """Apply the copy_contents skip/only filters to a relative path"""
+    if skip_sound and 'sound' in rel_path.parts:
+        return True
+    if only_sound and 'sound' not in rel_path.parts:
+        return True
+    if skip_w3x and skip_w3m_w3x_folder(rel_path):
+        return True
+    return False
+
+def collect_layer(src_dir, skip_w3x=False, skip_sound=False, only_sound=False):
+    """Return {relative path: source file} for the files copy_contents would copy"""
+    layer = {}
+    if not src_dir.exists() or not src_dir.is_dir():
+        return layer
+
+    for entry in list_files(src_dir):
+        if not _is_filtered_out(entry.rel_path, skip_w3x, skip_sound, only_sound):
+            layer[entry.rel_path] = entry.path
+    return layer
+
+def plan_overlay(layers):
+    """
+    Resolve overlay layers into a single {relative path: winning source} manifest
+
+    Layers are applied in order, so a later layer overrides an earlier one for the same
+    destination. On case-insensitive filesystems, folders differing only in case are one
+    folder: every path is respelled with the first spelling seen for each of its folders,
+    so the staged tree, the zip and the baseline all create it under that name.
+    Top-level entries clean_folder would delete are dropped up front, judged by that spelling.
+    """
+    manifest = {}
+    folder_names = {}
+    for layer in layers:
+        for rel_path, src in layer.items():
+            parts = rel_path.parts
+            folders = [
+                folder_names.setdefault(os.path.normcase("/".join(parts[:depth + 1])), part)
+                for depth, part in enumerate(parts[:-1])
+            ]
+            # Same destination file on case-insensitive filesystems: first name wins, last content wins
+            key = os.path.normcase(str(rel_path))
+            previous = manifest.get(key)
+            manifest[key] = (previous[0] if previous else type(rel_path)(*folders, parts[-1]), src)
+
+    allowed = CLEAN_ALLOWED_DIRS | CLEAN_ALLOWED_FILES
+    return {rel_path: src for rel_path, src in manifest.values() if rel_path.parts[0] in allowed}
+
+def copy_manifest(manifest, dest_dir, label="Copying", progress_callback=None, transfer_mode="auto",
+                  skip_unchanged=False):
+    """Copy each manifest entry to dest_dir exactly once
+
+    With skip_unchanged, entries already in dest_dir with the same size and mtime as their
+    source are left as they are (counted as "unchanged" in the transfer summary).
+    """
+    if not progress_callback:
+        progress_callback = print
+
+    total_files = len(manifest)
+    if not total_files:
+        progress_callback(f"  | ⚠️ Nothing to copy into: {dest_dir}")
+        return
+
+    progress = ProgressThrottle(progress_callback, "copy", label, total_files)
+    engine = CopyEngine(transfer_mode=transfer_mode, skip_unchanged=skip_unchanged)
+    with span("copy", files=total_files):
+        errors = engine.copy(
+            ((src, dest_dir / rel_path) for rel_path, src in manifest.items()),
+            progress=lambda done, total: progress.update(done), progress_every=1
+        )
+    for src, e in errors:
+        progress_callback(f"  - ⚠️ Error copying {src}: {str(e)}")
+
+    progress_callback(f"  | 🔗 Transfers: {engine.stats.summary()}")
+
 def copy_contents(src_dir, dest_dir, skip_w3x=False, skip_sound=False, 
-                 only_sound=False, label="Copying", progress_callback=None):
-    """Copy files with detailed progress reporting"""
+                 only_sound=False, label="Copying", progress_callback=None,
+                 transfer_mode="auto", stats=None, skip_unchanged=False, compare_hash=False):
+    """Copy files with detailed progress reporting
+
+    transfer_mode selects hardlink/reflink/copy per file (see file_transfer.transfer_file);
+    pass a TransferStats as stats to collect which methods were used.
+
+    With skip_unchanged, files already in dest_dir with the same size and mtime (or the
+    same content, with compare_hash) are not copied again, like rsync.
+    """
     if not progress_callback:
         progress_callback = print
     
@@ -163,53 +596,40 @@ def copy_contents(src_dir, dest_dir, skip_w3x=False, skip_sound=False,
         return
     
     # Prepare file list
-    all_files = list(src_dir.rglob("*"))
+    with span("walk", source=src_dir):
+        all_files = list_files(src_dir)
     if not all_files:
         progress_callback(f"  | ⚠️ No files found in: {src_dir}")
         return
         
     total_files = len(all_files)
-    processed = 0
-    copied_count = 0
-    skipped_count = 0
+    pairs = []
     
-    for item in all_files:
-        if item.is_dir():
-            continue
-            
-        rel_path = item.relative_to(src_dir)
-        dest_path = dest_dir / rel_path
-
+    for entry in all_files:
         # Apply skip/only filters
-        skip = False
-        if skip_sound and 'sound' in rel_path.parts:
-            skip = True
-        elif only_sound and 'sound' not in rel_path.parts:
-            skip = True
-        elif skip_w3x and skip_w3m_w3x_folder(rel_path):
-            skip = True
-
-        if skip:
-            skipped_count += 1
-            processed += 1
-            continue
+        if not _is_filtered_out(entry.rel_path, skip_w3x, skip_sound, only_sound):
+            pairs.append((entry.path, dest_dir / entry.rel_path))
 
-        try:
-            dest_path.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(item, dest_path)
-            copied_count += 1
-            processed += 1
-            
-            # Update progress periodically
-            if processed % 50 == 0 or processed == total_files:
-                progress = f"{label}: {processed}/{total_files} ({int(processed/total_files*100)}%)"
-                progress_callback(progress)
-                
-        except Exception as e:
-            progress_callback(f"  - ⚠️ Error copying {item}: {str(e)}")
-    
-    # sleep(1.0)
-    # progress_callback(f"  - ✅ Completed {label} - Copied: {copied_count}, Skipped: {skipped_count}")
+    # Filtered-out entries count as already processed in the progress display
+    already_processed = total_files - len(pairs)
+
+    progress = ProgressThrottle(progress_callback, "copy", label, total_files)
+
+    engine = CopyEngine(transfer_mode=transfer_mode, stats=stats, skip_unchanged=skip_unchanged,
+                        compare_hash=compare_hash)
+    skipped_files = engine.stats.files[UNCHANGED]
+    skipped_bytes = engine.stats.bytes[UNCHANGED]
+    with span("copy", source=src_dir, files=len(pairs)):
+        errors = engine.copy(pairs, progress=lambda done, total: progress.update(already_processed + done),
+                             progress_every=1)
+    for item, e in errors:
+        progress_callback(f"  - ⚠️ Error copying {item}: {str(e)}")
+
+    if skip_unchanged:
+        skipped_files = engine.stats.files[UNCHANGED] - skipped_files
+        skipped_bytes = engine.stats.bytes[UNCHANGED] - skipped_bytes
+        progress_callback(f"  | ⏭️ Skipped {skipped_files} unchanged files "
+                          f"({skipped_bytes / (1024 * 1024):.1f} MB)")
 
 def clean_folder(folder_path, progress_callback):
     """Clean unnecessary files and folders"""
@@ -218,65 +638,54 @@ def clean_folder(folder_path, progress_callback):
     
     progress_callback(f"  | 🧹 Cleaning temporary folder: {folder_path.name}")
     
-    allowed_dirs = {"maps", "movies", "sound", "ui", "units", "campaign", "fonts"}
-    allowed_files = {"war3patch.txt"}
-    
     removed_dirs = 0
     removed_files = 0
     
-    for item in folder_path.iterdir():
-        name = item.name
-        keep = name in allowed_dirs or name in allowed_files
-        
-        if not keep:
-            try:
-                if item.is_dir():
-                    shutil.rmtree(item, ignore_errors=True)
-                    removed_dirs += 1
-                    progress_callback(f"  |   |  🗑️ Removed directory: {name}")
-                else:
-                    item.unlink()
-                    removed_files += 1
-            except Exception as e:
-                progress_callback(f"  | ⚠️ Error removing {name}: {str(e)}")
+    with span("clean"):
+        for item in folder_path.iterdir():
+            name = item.name
+            keep = name in CLEAN_ALLOWED_DIRS or name in CLEAN_ALLOWED_FILES
+            
+            if not keep:
+                try:
+                    if item.is_dir():
+                        shutil.rmtree(item, ignore_errors=True)
+                        removed_dirs += 1
+                        progress_callback(f"  |   |  🗑️ Removed directory: {name}")
+                    else:
+                        item.unlink()
+                        removed_files += 1
+                except Exception as e:
+                    progress_callback(f"  | ⚠️ Error removing {name}: {str(e)}")
     
     progress_callback(f"  | 🧹 Cleanup complete | Dirs: {removed_dirs}, Files: {removed_files}")
 
 def zip_and_remove(folder_path, progress_callback):
 
-    """Create zip archive and remove original folder"""
+    """Create zip archive and remove original folder, returning the archive path"""
     if not folder_path.exists():
         progress_callback(f"  | ⚠️ Nothing to zip: {folder_path} not found")
         return
         
-    zip_path = folder_path.with_suffix(".zip")
-    
-    # Check if zip already exists
-    if zip_path.exists():
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        zip_path = zip_path.with_name(f"{zip_path.stem}_{timestamp}.zip")
+    # Use a timestamped name if the zip already exists
+    zip_path = available_zip_path(folder_path.with_suffix(".zip"))
     
     progress_callback(f"  | 📦 Creating archive: {zip_path.name}")
     
-    all_files = list(folder_path.rglob("*"))
+    # The staging folder was just written, so it is walked again rather than memoized
+    with span("walk", source=folder_path):
+        all_files = list(walk_files(folder_path))
     if not all_files:
         progress_callback("  | ⚠️ Nothing to zip | folder is empty")
         return
         
-    total_files = len(all_files)
-    processed = 0
+    progress = ProgressThrottle(progress_callback, "zip", "  |   |   Zipping", len(all_files))
     
     try:
-        with ZipFile(zip_path, 'w') as zipf:
-            for file in all_files:
-                if file.is_file():
-                    arcname = file.relative_to(folder_path)
-                    zipf.write(file, arcname)
-                    processed += 1
-                    
-                    if processed % 50 == 0 or processed == total_files:
-                        progress = f"  |   |   Zipping: {processed}/{total_files} ({int(processed/total_files*100)}%)"
-                        progress_callback(progress)
+        with span("zip", files=len(all_files)), ParallelZipWriter(zip_path) as zipf:
+            for processed, entry in enumerate(all_files, 1):
+                zipf.add_file(entry.path, entry.rel_path.as_posix(), stat=entry.stat)
+                progress.update(processed)
         
         # Verify zip creation
         if zip_path.stat().st_size == 0:
@@ -286,12 +695,14 @@ def zip_and_remove(folder_path, progress_callback):
             
         # Remove original folder
         try:
-            shutil.rmtree(folder_path)
+            with span("remove_staging"):
+                shutil.rmtree(folder_path)
             progress_callback(f"  | ✅ Removed temporary folder: {folder_path.name}")
         except Exception as e:
             progress_callback(f"  | ⚠️ Error removing temp folder: {str(e)}")
 
         progress_callback(f"  | 📦 Archive created: {Path(zip_path).name} ({zip_path.stat().st_size//1024} KB)")
+        return zip_path
             
     except Exception as e:
         progress_callback(f"  | ⛔ Zip creation failed: {str(e)}")
@@ -309,7 +720,7 @@ def find_homemade_folder(region_code, HOMEMADE_DATA):
                 return folder
     return None
 
-def handle_campaign_strings(casc_region_folder, patch_folder, region_code, base_dir, progress_callback):
+def handle_campaign_strings(casc_region_folder, patch_folder, region_code, progress_callback):
     """Convert campaignstrings.txt files if needed"""
     # Define paths to campaign string files
     casc_campaignstrings = casc_region_folder / "ui" / "campaignstrings.txt"
@@ -318,12 +729,13 @@ def handle_campaign_strings(casc_region_folder, patch_folder, region_code, base_
     patch_campaignstrings_exp = patch_folder / "ui" / "campaignstrings_exp.txt"
     
     # Get template path
-    template_file = base_dir / "__Misc_Tools" / "campaignstrings_translator" / "template_1.31.txt"
+    template_file = CAMPAIGN_STRINGS_TEMPLATE
     
     # Ensure template exists
     if not template_file.exists():
         progress_callback(f"❌ Error: Template file not found at {template_file}")
         return
+    template = shared_templates().get(template_file, parse_campaign_template)
     
     # Process base campaign strings if it doesn't exist in CASC
     if not casc_campaignstrings.exists():
@@ -338,7 +750,7 @@ def handle_campaign_strings(casc_region_folder, patch_folder, region_code, base_
             convert_campaign_strings(
                 str(template_file), 
                 str(patch_campaignstrings),
-                progress_callback
+                template=template
             )
             progress_callback(f"✅ Converted campaign strings for {region_code}")
         else:
@@ -359,52 +771,10 @@ def handle_campaign_strings(casc_region_folder, patch_folder, region_code, base_
             convert_campaign_strings(
                 str(template_file), 
                 str(patch_campaignstrings_exp),
-                progress_callback
+                template=template
             )
             progress_callback(f"✅ Converted expansion campaign strings for {region_code}")
         else:
             progress_callback(f"⚠️ Warning: No campaignstrings_exp.txt found in CASC or patch for {region_code}")
     else:
         progress_callback("ℹ️ Using CASC campaignstrings_exp.txt - no conversion needed")
-
-def run_worldeditor_translator(region_patch_folder, region_code, base_dir, progress_callback):
-    """Run worldeditor translator on UI files with single translator initialization"""
-    template_dir = base_dir / "__Misc_Tools" / "worldeditor_translator"
-    
-    # Files to process
-    ui_files = [
-        ("worldeditgamestrings_template.txt", "worldeditgamestrings.txt"),
-        ("worldeditstrings_template.txt", "worldeditstrings.txt")
-    ]
-    
-    ui_folder = region_patch_folder / "ui"
-    if not ui_folder.exists():
-        progress_callback(f"  | ⚠️ UI folder not found: {ui_folder}")
-        return
-    
-    # Create translator instance for this region
-    translator = WorldEditorTranslator(region_code, progress_callback)
-    
-    for template_file, target_file in ui_files:
-        ui_file_path = ui_folder / target_file
-        template_path = template_dir / template_file
-        
-        # Validate files exist
-        if not template_path.exists():
-            progress_callback(f"  | ⚠️ Template file not found: {template_path}")
-            continue
-            
-        if not ui_file_path.exists():
-            progress_callback(f"  | ⚠️ Target file not found: {ui_file_path}")
-            continue
-            
-        try:
-            # Process file using translator instance
-            progress_callback(f"  | 🌍 Translating {target_file} for {region_code}")
-            translator.process_file(
-                str(template_path), 
-                str(ui_file_path)
-            )
-            progress_callback(f"  | ✅ Translated {target_file} for {region_code}")
-        except Exception as e:
-            progress_callback(f"  | ⛔ Failed to translate {target_file}: {str(e)}")
\ No newline at end of file
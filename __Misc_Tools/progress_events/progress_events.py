@@ -0,0 +1,52 @@
+import time
+from typing import NamedTuple
+
+# Minimum delay between two reports of the same stage, in seconds
+PROGRESS_INTERVAL = 0.25
+
+class ProgressEvent(NamedTuple):
+    """
+    Progress of a build stage, passed to progress callbacks alongside plain messages
+
+    stage: Short stage id (copy, convert, zip, translate, ...)
+    done / total: Items processed so far, out of total
+    message: Label of the progress line
+    region: Region being built ("" until the build scheduler tags it)
+    """
+    stage: str
+    done: int
+    total: int
+    message: str
+    region: str = ""
+
+    @property
+    def percent(self):
+        return int(self.done / self.total * 100) if self.total else 100
+
+    def __str__(self):
+        return f"{self.message}: {self.done}/{self.total} ({self.percent}%)"
+
+class ProgressThrottle:
+    """
+    Report the progress of one stage as ProgressEvents, at most every interval seconds
+
+    The first and the final (done == total) updates are always reported.
+    """
+    def __init__(self, progress_callback, stage, message, total, interval=PROGRESS_INTERVAL):
+        self.progress_callback = progress_callback
+        self.stage = stage
+        self.message = message
+        self.total = total
+        self.interval = interval
+        self._reported = None
+        self._reported_at = 0.0
+
+    def update(self, done):
+        if done == self._reported:
+            return
+        now = time.monotonic()
+        if self._reported is not None and done < self.total and now - self._reported_at < self.interval:
+            return
+        self._reported = done
+        self._reported_at = now
+        self.progress_callback(ProgressEvent(self.stage, done, self.total, self.message))
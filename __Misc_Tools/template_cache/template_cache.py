@@ -0,0 +1,94 @@
+import os
+import pickle
+import hashlib
+import threading
+from pathlib import Path
+
+TEMPLATE_CACHE_VERSION = 1
+
+class FrozenDict(dict):
+    """Read-only dict for parsed templates shared between translators and regions"""
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("parsed templates are read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+class TemplateCache:
+    """
+    Parsed templates, loaded once per process
+
+    A template is identified by its path and the parser used on it, and is parsed again
+    only when its size or mtime changes. With a cache_dir the parsed form is also pickled
+    to disk, so the other build processes (and the next builds) skip parsing as well.
+    Parsers must return immutable structures (tuples, FrozenDict) since every caller
+    gets the same object.
+
+    Args:
+        cache_dir: Folder for the on-disk copies (None keeps them in memory only)
+    """
+    def __init__(self, cache_dir=None):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._parsed = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, parser):
+        """parser(path) result for a template, reusing it while the file is unchanged"""
+        path = Path(path)
+        stat = path.stat()
+        parser_name = f"{parser.__module__}.{parser.__qualname__}"
+        key = (str(path.resolve()), parser_name)
+        signature = (TEMPLATE_CACHE_VERSION, stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            known = self._parsed.get(key)
+            if known and known[0] == signature:
+                return known[1]
+
+            parsed = self._load(key, signature)
+            if parsed is None:
+                parsed = parser(path)
+                self._store(key, signature, parsed)
+            self._parsed[key] = (signature, parsed)
+            return parsed
+
+    def _disk_path(self, key):
+        digest = hashlib.blake2b("\n".join(key).encode('utf-8'), digest_size=16).hexdigest()
+        return self.cache_dir / f"{digest}.pickle"
+
+    def _load(self, key, signature):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                stored_signature, parsed = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError):
+            return None
+        return parsed if stored_signature == signature else None
+
+    def _store(self, key, signature, parsed):
+        if self.cache_dir is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            target = self._disk_path(key)
+            tmp_file = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+            with open(tmp_file, 'wb') as f:
+                pickle.dump((signature, parsed), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, target)
+        except OSError:
+            pass
+
+_shared_templates = None
+
+def shared_templates(cache_dir=None):
+    """Process-wide TemplateCache; cache_dir enables its on-disk copies"""
+    global _shared_templates
+    if _shared_templates is None:
+        _shared_templates = TemplateCache(cache_dir)
+    elif cache_dir and _shared_templates.cache_dir is None:
+        _shared_templates.cache_dir = Path(cache_dir)
+    return _shared_templates
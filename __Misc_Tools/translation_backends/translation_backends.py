@@ -0,0 +1,202 @@
+import json
+import time
+import random
+import asyncio
+import threading
+import urllib.error
+import urllib.request
+
+# Backend used by translate_fdf, and the URL of the "http" backend
+BACKEND_ENV = "WC3_FDF_BACKEND"
+BACKEND_URL_ENV = "WC3_FDF_BACKEND_URL"
+DEFAULT_BACKEND = "google"
+
+# Google Translate codes that differ from ours
+GOOGLE_LANGUAGE_CODES = {"zh": "zh-CN", "zh-tw": "zh-TW"}
+
+class TranslationError(Exception):
+    pass
+
+class PermanentTranslationError(TranslationError):
+    """A request the service rejected for good, not worth retrying"""
+
+class TranslationBackend:
+    """
+    A translation service driven by run_translations
+
+    Subclasses implement translate(). concurrency bounds the requests in flight and
+    rate (requests per second, None for unlimited) feeds the token bucket.
+    """
+    name = "none"
+    model = ""
+    concurrency = 1
+    rate = None
+
+    async def translate(self, text, source, target):
+        raise NotImplementedError
+
+class NoopBackend(TranslationBackend):
+    """Keep texts untranslated (offline builds, or a region already in the source language)"""
+    name = "noop"
+    concurrency = 64
+
+    async def translate(self, text, source, target):
+        return text
+
+class GoogleBackend(TranslationBackend):
+    """
+    Google Translate through deep_translator, run in worker threads
+
+    GoogleTranslator keeps the query being sent on the instance, so each worker thread
+    gets its own translators.
+    """
+    name = "google"
+    model = "GoogleTranslator"
+    concurrency = 4
+    rate = 5
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _translate(self, text, source, target):
+        translators = getattr(self._local, "translators", None)
+        if translators is None:
+            translators = self._local.translators = {}
+        translator = translators.get((source, target))
+        if translator is None:
+            from deep_translator import GoogleTranslator
+            translator = translators[(source, target)] = GoogleTranslator(source=source, target=target)
+        return translator.translate(text)
+
+    async def translate(self, text, source, target):
+        target = GOOGLE_LANGUAGE_CODES.get(target, target)
+        translated = await asyncio.to_thread(self._translate, text, source, target)
+        if not translated:
+            raise TranslationError("empty translation")
+        return translated
+
+class HttpBackend(TranslationBackend):
+    """
+    Remote service speaking the LibreTranslate JSON API
+
+    POST {"q", "source", "target", "format"} to url, answered by {"translatedText"}.
+    Server errors (5xx) and rate limiting (429) are retried by translate_concurrently,
+    other HTTP errors are not.
+    """
+    name = "http"
+    concurrency = 8
+
+    def __init__(self, url, timeout=30, rate=None):
+        self.url = url
+        self.model = url
+        self.timeout = timeout
+        self.rate = rate
+
+    def _post(self, text, source, target):
+        body = json.dumps({"q": text, "source": source, "target": target, "format": "text"}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                answer = json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            if e.code == 429 or e.code >= 500:
+                raise
+            raise PermanentTranslationError(f"HTTP {e.code}: {e.reason}") from e
+        if "translatedText" not in answer:
+            raise TranslationError(answer.get("error", "no translatedText in answer"))
+        return answer["translatedText"]
+
+    async def translate(self, text, source, target):
+        return await asyncio.to_thread(self._post, text, source, target)
+
+class LocalModelBackend(TranslationBackend):
+    """The region's WorldEditorTranslator model (from the shared model pool), one batch at a time"""
+    name = "local"
+
+    def __init__(self, region_code):
+        from __Misc_Tools.worldeditor_translator.worldeditor_translator import WorldEditorTranslator
+
+        self._translator = WorldEditorTranslator(region_code, progress_callback=lambda message: None)
+        self.model = self._translator.model_name
+
+    async def translate(self, text, source, target):
+        translated = (await asyncio.to_thread(self._translator.translate_batch, [text]))[0]
+        if translated == f"[AUTO] {text}":
+            raise TranslationError("model translation failed")
+        return translated
+
+def create_backend(config, region_code):
+    """Backend described by a translator config (see fdf_translator_config)"""
+    if config["source"] == config["target"] or config["backend"] == "noop":
+        return NoopBackend()
+    if config["backend"] == "google":
+        return GoogleBackend()
+    if config["backend"] == "http":
+        return HttpBackend(config["url"])
+    if config["backend"] == "local":
+        return LocalModelBackend(region_code)
+    raise ValueError(f"Unknown translation backend: {config['backend']}")
+
+class TokenBucket:
+    """Allow rate acquisitions per second on average, with bursts of up to capacity"""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+async def translate_concurrently(backend, texts, source, target, retries=3, backoff=0.5, max_failures=10,
+                                 on_error=None):
+    """
+    Translate texts with at most backend.concurrency requests in flight
+
+    Failed requests are retried with exponential backoff (except PermanentTranslationError). Once max_failures texts in a row
+    could not be translated the backend is considered down and the remaining texts are
+    given up. Returns {text: translation} for the texts that succeeded; on_error(text,
+    exception) is called for the others.
+    """
+    semaphore = asyncio.Semaphore(backend.concurrency)
+    bucket = TokenBucket(backend.rate) if backend.rate else None
+    results = {}
+    failures_in_row = 0
+
+    async def translate_one(text):
+        nonlocal failures_in_row
+        async with semaphore:
+            for attempt in range(retries + 1):
+                if failures_in_row >= max_failures:
+                    if on_error:
+                        on_error(text, TranslationError(f"{backend.name} backend unavailable"))
+                    return
+                if bucket:
+                    await bucket.acquire()
+                try:
+                    results[text] = await backend.translate(text, source, target)
+                    failures_in_row = 0
+                    return
+                except Exception as e:
+                    if attempt == retries or isinstance(e, PermanentTranslationError):
+                        failures_in_row += 1
+                        if on_error:
+                            on_error(text, e)
+                        return
+                    await asyncio.sleep(backoff * (2 ** attempt) * (1 + random.random() / 2))
+
+    await asyncio.gather(*(translate_one(text) for text in dict.fromkeys(texts)))
+    return results
+
+def run_translations(backend, texts, source, target, **kwargs):
+    """Blocking wrapper of translate_concurrently"""
+    return asyncio.run(translate_concurrently(backend, texts, source, target, **kwargs))
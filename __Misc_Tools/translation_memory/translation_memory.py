@@ -0,0 +1,118 @@
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+# SQLite file overriding the translation memory of every build (benchmarks, tests)
+TRANSLATION_MEMORY_ENV = "WC3_TRANSLATION_MEMORY"
+# File name of the memory kept in a build cache folder
+MEMORY_FILE_NAME = "translation_memory.sqlite3"
+# Database of a memory that only lasts as long as the process
+IN_MEMORY = ":memory:"
+
+DEFAULT_MAX_ENTRIES = 200_000
+
+def normalize_text(text):
+    """Key form of a source string: surrounding and repeated whitespace is ignored"""
+    return " ".join(text.split())
+
+class TranslationMemory:
+    """
+    Persistent store of translated strings shared by every translator
+
+    Entries are keyed by (backend, model, target language, normalized source text) so a
+    string is only sent to a model or a remote service once. The least recently used
+    entries are evicted once the store holds more than max_entries strings. The database
+    is opened in WAL mode so concurrent region builds can share it.
+
+    Args:
+        db_path: SQLite file, or IN_MEMORY (the default) for a store lasting as long as the process
+        max_entries: Number of strings kept before evicting the least recently used ones
+    """
+    def __init__(self, db_path=IN_MEMORY, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path if db_path == IN_MEMORY else Path(db_path)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        if self.db_path != IN_MEMORY:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " backend TEXT NOT NULL, model TEXT NOT NULL, lang TEXT NOT NULL,"
+                " source TEXT NOT NULL, target TEXT NOT NULL, last_used REAL NOT NULL,"
+                " PRIMARY KEY (backend, model, lang, source))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+
+    def lookup(self, backend, model, lang, texts):
+        """Known translations of texts as {text: translation}, refreshing their last use"""
+        keys = {}
+        for text in texts:
+            keys.setdefault(normalize_text(text), []).append(text)
+        found = {}
+        hits = []
+        with self._lock, self._conn:
+            query = "SELECT target FROM translations WHERE backend=? AND model=? AND lang=? AND source=?"
+            for key, originals in keys.items():
+                row = self._conn.execute(query, (backend, model, lang, key)).fetchone()
+                if row:
+                    hits.append(key)
+                    for text in originals:
+                        found[text] = row[0]
+            if hits:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE translations SET last_used=? WHERE backend=? AND model=? AND lang=? AND source=?",
+                    [(now, backend, model, lang, key) for key in hits],
+                )
+        return found
+
+    def store(self, backend, model, lang, translations):
+        """Remember {text: translation} pairs and evict the oldest entries past max_entries"""
+        if not translations:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)",
+                [(backend, model, lang, normalize_text(text), translated, now)
+                 for text, translated in translations.items()],
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM translations WHERE rowid IN"
+                    " (SELECT rowid FROM translations ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_shared_memories = {}
+_shared_lock = threading.Lock()
+
+def shared_memory(db_path=None):
+    """
+    Process-wide TranslationMemory of a database file
+
+    Builds keep it in their build cache folder (see memory_path). The
+    WC3_TRANSLATION_MEMORY environment variable takes precedence over db_path; with
+    neither, the memory only lasts as long as the process.
+    """
+    db_path = os.environ.get(TRANSLATION_MEMORY_ENV) or db_path or IN_MEMORY
+    key = db_path if db_path == IN_MEMORY else os.path.normcase(os.path.abspath(db_path))
+    with _shared_lock:
+        memory = _shared_memories.get(key)
+        if memory is None:
+            memory = _shared_memories[key] = TranslationMemory(db_path)
+        return memory
+
+def memory_path(cache_dir):
+    """Translation memory file kept in a build cache folder"""
+    return Path(cache_dir) / MEMORY_FILE_NAME
@@ -0,0 +1,107 @@
+import os
+from pathlib import Path
+from typing import NamedTuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Walk memo of the build running in the current thread/context, if any
+_active_memo = ContextVar("active_walk_memo", default=None)
+
+class FileEntry(NamedTuple):
+    """A file found by walk_files, with the stat data read while walking"""
+    path: Path
+    rel_path: Path
+    rel_dir: str  # Posix folder of rel_path, "" at the root
+    stat: os.stat_result
+
+def walk_files(root, on_dir=None):
+    """
+    Yield a FileEntry for every file below root, streaming one os.scandir listing at a time
+
+    Files of a folder come before those of its subfolders, in the order os.walk visits them.
+    Symlinked folders are not followed (like Path.rglob). Stat data comes with the listing
+    on Windows and costs a single stat per file elsewhere, instead of the is_dir/is_file
+    and size lookups of a Path based walk.
+
+    Args:
+        root: Folder to walk
+        on_dir: Called as on_dir(relative posix path, stat) for every subfolder, before
+                any of its files is yielded (optional)
+    """
+    root = Path(root)
+    pending = [("", os.fspath(root))]
+    while pending:
+        rel_dir, folder = pending.pop()
+        rel_dir_name = rel_dir[:-1]
+        subfolders = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subfolders.append((f"{rel_dir}{entry.name}/", entry))
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    yield FileEntry(Path(entry.path), Path(rel_dir + entry.name), rel_dir_name, stat)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+
+        for rel_subfolder, entry in subfolders:
+            if on_dir:
+                on_dir(rel_subfolder[:-1], entry.stat())
+        pending.extend((rel_subfolder, entry.path) for rel_subfolder, entry in reversed(subfolders))
+
+class WalkMemo:
+    """
+    Files of the trees walked during one build, and the stat data they came with
+
+    Only meant for trees a build reads (game data, HomeMade overrides): a tree the build
+    writes into must be walked again with walk_files.
+    """
+    def __init__(self):
+        self._trees = {}
+        self._stats = {}
+
+    def files(self, root):
+        key = os.path.normcase(os.path.abspath(root))
+        entries = self._trees.get(key)
+        if entries is None:
+            entries = tuple(walk_files(root))
+            self._trees[key] = entries
+            for entry in entries:
+                self._stats[os.fspath(entry.path)] = entry.stat
+        return entries
+
+    def stat(self, path):
+        """Stat of a file seen while walking, or None"""
+        return self._stats.get(os.fspath(path))
+
+@contextmanager
+def walk_memo():
+    """Share one WalkMemo between every list_files/file_stat call of the enclosed build"""
+    if _active_memo.get() is not None:
+        yield _active_memo.get()
+        return
+    memo = WalkMemo()
+    token = _active_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _active_memo.reset(token)
+
+def list_files(root):
+    """FileEntry tuple of a tree the build only reads, walked once per build when a memo is active"""
+    memo = _active_memo.get()
+    if memo is None:
+        return tuple(walk_files(root))
+    return memo.files(root)
+
+def file_stat(path):
+    """Stat of path, reusing the one read while walking its tree when a memo is active"""
+    memo = _active_memo.get()
+    stat = memo.stat(path) if memo is not None else None
+    return stat if stat is not None else os.stat(path)
@@ -1,42 +1,81 @@
+import os
 import re
-from deep_translator import GoogleTranslator
+from typing import NamedTuple
 
-def translate_fdf(english_fdf_template_path, language_fdf_path, output_path):
-    """Translate FDF keys directly as a function with improved formatting"""
-    # === Helpers ===
-    def parse_fdf(file_path):
-        # Read with UTF-8-sig to handle BOM
-        with open(file_path, "r", encoding="utf-8-sig", errors="ignore") as f:
-            content = f.read()
-            
-        # Extract header comment if present
-        header_match = re.search(r'/\*(.*?)\*/', content, re.DOTALL)
-        header = header_match.group(0).strip() + "\n\n" if header_match else ""
-        
-        # Extract StringList content
-        stringlist_match = re.search(r'StringList\s*{([^}]*)}', content, re.DOTALL)
-        if not stringlist_match:
-            return {}, [], header, ""
-            
-        stringlist_content = stringlist_match.group(1).strip()
-        entries = {}
-        lines = []
+from __Misc_Tools.template_cache.template_cache import FrozenDict
+from __Misc_Tools.translation_memory.translation_memory import shared_memory
+from __Misc_Tools.translation_backends.translation_backends import (
+    BACKEND_ENV, BACKEND_URL_ENV, DEFAULT_BACKEND, create_backend, run_translations
+)
+from __Misc_Tools.worldeditor_translator.worldeditor_translator import region_to_language_code
+
+FDF_ENTRY = re.compile(r'([A-Z0-9_]+)\s+"(.*)",')
+
+def fdf_translator_config(region_code):
+    """Settings that determine the output of translate_fdf for a region
+
+    The backend (google, http, local or noop) comes from WC3_FDF_BACKEND, the http backend URL from WC3_FDF_BACKEND_URL
+    """
+    backend = os.environ.get(BACKEND_ENV, DEFAULT_BACKEND)
+    config = {"backend": backend, "source": "en", "target": region_to_language_code(region_code)}
+    if backend == "http":
+        config["url"] = os.environ.get(BACKEND_URL_ENV, "")
+    return config
+
+class FdfFile(NamedTuple):
+    """Parsed StringList FDF: entries (key -> text), their lines, the header comment and raw content"""
+    entries: dict
+    lines: tuple
+    header: str
+    content: str
+
+def parse_fdf(file_path):
+    """Parse the StringList of an FDF file"""
+    # Read with UTF-8-sig to handle BOM
+    with open(file_path, "r", encoding="utf-8-sig", errors="ignore") as f:
+        content = f.read()
         
-        # Parse individual lines
-        for line in stringlist_content.split('\n'):
-            line = line.strip()
-            if not line:
-                continue
-            match = re.match(r'([A-Z0-9_]+)\s+"(.*)",', line)
-            if match:
-                key, value = match.groups()
-                entries[key] = value
-                lines.append(line)
+    # Extract header comment if present
+    header_match = re.search(r'/\*(.*?)\*/', content, re.DOTALL)
+    header = header_match.group(0).strip() + "\n\n" if header_match else ""
+    
+    # Extract StringList content
+    stringlist_match = re.search(r'StringList\s*{([^}]*)}', content, re.DOTALL)
+    if not stringlist_match:
+        return FdfFile(FrozenDict(), (), header, "")
         
-        return entries, lines, header, stringlist_content
+    stringlist_content = stringlist_match.group(1).strip()
+    entries = {}
+    lines = []
+    
+    # Parse individual lines
+    for line in stringlist_content.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        match = FDF_ENTRY.match(line)
+        if match:
+            key, value = match.groups()
+            entries[key] = value
+            lines.append(line)
+    
+    return FdfFile(FrozenDict(entries), tuple(lines), header, stringlist_content)
 
+def translate_fdf(english_fdf_template_path, language_fdf_path, output_path=None, memory=None, template=None,
+                  region_code="frFR", backend=None, on_error=None):
+    """Translate FDF keys directly as a function with improved formatting
+
+    Returns the translated content; it is only written to disk when output_path is given.
+    Missing keys are translated to the language of region_code, concurrently, through backend
+    (by default the one of fdf_translator_config). Strings found in the translation memory
+    (the shared one by default) are not sent to the backend.
+    template can be the already parsed english_fdf_template_path (see parse_fdf)
+    on_error(key, exception) is called for every key left in English because its translation failed
+    """
     # === Load files ===
-    english_entries, english_lines, eng_header, _ = parse_fdf(english_fdf_template_path)
+    if template is None:
+        template = parse_fdf(english_fdf_template_path)
+    english_entries, eng_header = template.entries, template.header
     french_entries, french_lines, fr_header, fr_content = parse_fdf(language_fdf_path)
     
     # Use English header if French header is empty
@@ -44,25 +83,39 @@ def translate_fdf(english_fdf_template_path, language_fdf_path, output_path):
 
     # === Identify missing keys ===
     missing_keys = sorted(set(english_entries) - set(french_entries))
-    translator = GoogleTranslator(source="en", target="fr")
+    config = fdf_translator_config(region_code)
+    source, target = config["source"], config["target"]
+    if backend is None:
+        backend = create_backend(config, region_code)
+    memory = memory if memory is not None else shared_memory()
+    remembered = memory.lookup(backend.name, backend.model, target, [english_entries[key] for key in missing_keys])
+
+    # === Translate missing texts concurrently ===
+    pending = [english_entries[key] for key in missing_keys if english_entries[key] not in remembered]
+    errors = {}
+    learned = run_translations(backend, pending, source, target,
+                               on_error=lambda text, e: errors.setdefault(text, e)) if pending else {}
+    # Replace problematic characters
+    learned = {text: translated.replace("ï»¿", "").strip() for text, translated in learned.items()}
+    if backend.name != "noop":
+        memory.store(backend.name, backend.model, target, learned)
 
-    # === Translate and format missing lines ===
+    # === Format missing lines ===
     translated_lines = []
     for key in missing_keys:
         english_text = english_entries[key]
-        try:
-            translated_text = translator.translate(english_text)
-            # Replace problematic characters
-            translated_text = translated_text.replace("ï»¿", "").strip()
-        except Exception as e:
-            print(f"Translation failed for key {key}: {e}")
+        translated_text = remembered.get(english_text, learned.get(english_text))
+        if translated_text is None:
+            print(f"Translation failed for key {key}: {errors.get(english_text)}")
+            if on_error:
+                on_error(key, errors.get(english_text))
             translated_text = english_text  # fallback
         line = f'    {key:<32}"{translated_text}", // Translated'
         translated_lines.append(line)
 
     # === Clean and format output ===
     # Combine existing and translated lines
-    all_lines = french_lines + translated_lines
+    all_lines = list(french_lines) + translated_lines
     
     # Remove duplicates while preserving order
     seen = set()
@@ -82,9 +135,10 @@ def translate_fdf(english_fdf_template_path, language_fdf_path, output_path):
     full_content = header + formatted_content
 
     # === Write output with proper encoding ===
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(full_content)
+    if output_path is not None:
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(full_content)
 
-    print(f"  - ✅ Translation complete! Output saved to: {output_path}")
+        print(f"  - ✅ Translation complete! Output saved to: {output_path}")
     return full_content
 
@@ -1,44 +1,125 @@
 import re
 import warnings
-from time import sleep
-from transformers import pipeline, set_seed
 from pathlib import Path
+from typing import NamedTuple
+
+from __Misc_Tools.model_pool.model_pool import model_pool
+from __Misc_Tools.progress_events.progress_events import ProgressThrottle
+from __Misc_Tools.template_cache.template_cache import FrozenDict
+from __Misc_Tools.translation_memory.translation_memory import shared_memory
 
 # Disable unnecessary warnings
 warnings.filterwarnings("ignore", message=".*sacremoses.*")
 
+# Updated model map with working public models
+MODEL_MAP = {
+    'fr': "Helsinki-NLP/opus-mt-en-fr",
+    'de': "Helsinki-NLP/opus-mt-en-de",
+    'es': "Helsinki-NLP/opus-mt-en-es",
+    'it': "Helsinki-NLP/opus-mt-en-it",
+    'ru': "Helsinki-NLP/opus-mt-en-ru",
+    'zh': "Helsinki-NLP/opus-mt-en-zh",
+    'ko': "facebook/m2m100_418M",  # Public multi-lingual model
+    'cs': "Helsinki-NLP/opus-mt-en-cs",
+    'pl': "facebook/m2m100_418M"   # Public multi-lingual model
+}
+
+DEFAULT_MODEL = "Helsinki-NLP/opus-mt-en-fr"
+
+# Strings translated per model call; batches group strings of similar length to limit padding
+DEFAULT_BATCH_SIZE = 16
+
+# A variable line (KEY=...) and its quoted value (KEY="value")
+VARIABLE_LINE = re.compile(r'^\s*([A-Z0-9_]+)\s*=.*$')
+QUOTED_VALUE = re.compile(r'^\s*[A-Z0-9_]+\s*=\s*"(.*)"\s*$')
+
+class LocalizationFile(NamedTuple):
+    """
+    Parsed localization file
+
+    lines: Every line of the file, without line endings
+    keys: Variable defined on each line (None for other lines)
+    index: Variable -> (index of its first line, its quoted value or None)
+    """
+    lines: tuple
+    keys: tuple
+    index: dict
+
+def parse_localization_text(content):
+    """Parse localization text in a single pass"""
+    lines = content.split('\n')
+    if lines and lines[-1] == "":
+        lines.pop()
+
+    keys = []
+    index = {}
+    for line_index, line in enumerate(lines):
+        match = VARIABLE_LINE.match(line)
+        if match:
+            var = match.group(1)
+            if var not in index:
+                value = QUOTED_VALUE.match(line)
+                index[var] = (line_index, value.group(1) if value else None)
+            keys.append(var)
+        else:
+            keys.append(None)
+
+    return LocalizationFile(tuple(lines), tuple(keys), FrozenDict(index))
+
+def load_localization_file(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return parse_localization_text(f.read())
+
+def region_to_language_code(region_code):
+    """Convert region codes to language codes"""
+    region_code = region_code.lower()
+    conversions = {
+        'cscz': 'cs',    # Czech
+        'kokr': 'ko',    # Korean
+        'plpl': 'pl',    # Polish
+        'ruru': 'ru',    # Russian
+        'zhtw': 'zh-tw', # Traditional Chinese
+    }
+    return conversions.get(region_code, region_code[:2])
+
+def translator_config(region_code):
+    """Settings that determine the output of WorldEditorTranslator for a region"""
+    lang_code = region_to_language_code(region_code)
+    return {"lang": lang_code, "model": MODEL_MAP.get(lang_code, DEFAULT_MODEL)}
+
 class WorldEditorTranslator:
-    def __init__(self, region_code, progress_callback=None):
+    def __init__(self, region_code, progress_callback=None, batch_size=DEFAULT_BATCH_SIZE, memory=None):
         self.region_code = region_code
         self.progress_callback = progress_callback
+        self.batch_size = max(1, batch_size)
         self.lang_code = self.region_to_language_code(region_code)
-        self.translator = self._initialize_translator()
+        self.model_name = MODEL_MAP.get(self.lang_code, DEFAULT_MODEL)
+        self.memory = memory if memory is not None else shared_memory()
+        self._translator = None
+        # Strings left untranslated ("[AUTO] ..." in the output) because the model failed on them
+        self.failures = 0
+
+    @property
+    def translator(self):
+        """(loader, translate) pair of the region, the model is only loaded once a string misses the translation memory"""
+        if self._translator is None:
+            self._translator = self._initialize_translator()
+        return self._translator
     
     def _initialize_translator(self):
-        """Load translation model with public alternatives for problematic languages"""
-        # Updated model map with working public models
-        model_map = {
-            'fr': "Helsinki-NLP/opus-mt-en-fr",
-            'de': "Helsinki-NLP/opus-mt-en-de",
-            'es': "Helsinki-NLP/opus-mt-en-es",
-            'it': "Helsinki-NLP/opus-mt-en-it",
-            'ru': "Helsinki-NLP/opus-mt-en-ru",
-            'zh': "Helsinki-NLP/opus-mt-en-zh",
-            'ko': "facebook/m2m100_418M",  # Public multi-lingual model
-            'cs': "Helsinki-NLP/opus-mt-en-cs",
-            'pl': "facebook/m2m100_418M"   # Public multi-lingual model
-        }
+        """Model loader and batch translation function for the region
 
+        The loaded model is passed to translate(model, texts). Regions using the same model
+        share one copy from the process-wide model pool; it is fetched again for every batch
+        so it can be unloaded between regions when memory runs short
+        """
         lang_name = self.lang_code.upper()
-        self.progress_callback(f"  | ⚙️ Initializing translation model for {lang_name}...")
         
         # Use the appropriate model
-        model_name = model_map.get(self.lang_code, "Helsinki-NLP/opus-mt-en-fr")
+        model_name = self.model_name
         
         # Special initialization for multi-lingual model
         if model_name == "facebook/m2m100_418M":
-            from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
-            
             # Language code mapping for m2m100
             lang_targets = {
                 'ko': 'ko',
@@ -47,154 +128,147 @@ class WorldEditorTranslator:
             
             target_lang = lang_targets.get(self.lang_code, 'fr')
             
-            self.progress_callback(f"  |   | Using multi-lingual model for {lang_name} → {target_lang}")
-            
-            # Initialize model components
-            model = M2M100ForConditionalGeneration.from_pretrained(model_name)
-            tokenizer = M2M100Tokenizer.from_pretrained(model_name)
+            def load_m2m100():
+                from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
+
+                self.progress_callback(f"  | ⚙️ Initializing translation model for {lang_name}...")
+                self.progress_callback(f"  |   | Using multi-lingual model for {lang_name} → {target_lang}")
+                
+                # Initialize model components
+                model = M2M100ForConditionalGeneration.from_pretrained(model_name)
+                tokenizer = M2M100Tokenizer.from_pretrained(model_name)
+                return model, tokenizer
             
-            # Create a custom translation function
-            def translate_fn(text):
+            # Create a custom batch translation function
+            def translate_fn(loaded, texts):
+                model, tokenizer = loaded
                 tokenizer.src_lang = "en"
-                encoded = tokenizer(text, return_tensors="pt")
+                encoded = tokenizer(texts, return_tensors="pt", padding=True)
                 generated_tokens = model.generate(
                     **encoded, 
                     forced_bos_token_id=tokenizer.get_lang_id(target_lang)
                 )
-                return tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)[0]
+                return tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
             
-            return translate_fn
+            return load_m2m100, translate_fn
         
         # Standard pipeline for other languages
-        return pipeline(
-            "translation",
-            model=model_name,
-            device="cpu"
-        )
+        def load_pipeline():
+            from transformers import pipeline
+
+            self.progress_callback(f"  | ⚙️ Initializing translation model for {lang_name}...")
+            return pipeline(
+                "translation",
+                model=model_name,
+                device="cpu"
+            )
+
+        def pipeline_fn(translation_pipeline, texts):
+            results = translation_pipeline(texts, max_length=512, batch_size=len(texts))
+            return [result['translation_text'] for result in results]
+
+        return load_pipeline, pipeline_fn
     
     def region_to_language_code(self, region_code):
         """Convert region codes to language codes"""
-        region_code = region_code.lower()
-        conversions = {
-            'cscz': 'cs',    # Czech
-            'kokr': 'ko',    # Korean
-            'plpl': 'pl',    # Polish
-            'ruru': 'ru',    # Russian
-            'zhtw': 'zh-tw', # Traditional Chinese
-        }
-        return conversions.get(region_code, region_code[:2])
+        return region_to_language_code(region_code)
     
     def translate_text(self, text):
-        """Handle translation with model-specific logic"""
-        if not text.strip() or self.translator is None:
-            return text
-        
+        """Translate a single string"""
+        return self.translate_many([text])[0]
+
+    def translate_batch(self, texts):
+        """Translate a list of strings in one model call, retrying one by one if the batch fails"""
+        texts = list(texts)
+        pending = [i for i, text in enumerate(texts) if text.strip()]
+        results = list(texts)
+        if not pending:
+            return results
+
+        # Loaded outside the retries below: a model that cannot load aborts the file once
+        loader, translate = self.translator
+        model = model_pool().get(self.model_name, loader)
         try:
-            # Handle different translator types
-            if callable(self.translator):
-                # Custom translation function
-                return self.translator(text)
-            else:
-                # Standard pipeline
-                return self.translator(text, max_length=512)[0]['translation_text']
+            translated = translate(model, [texts[i] for i in pending])
+            for i, text in zip(pending, translated):
+                results[i] = text
+            return results
         except Exception as e:
+            if len(pending) > 1:
+                for i in pending:
+                    results[i] = self.translate_batch([texts[i]])[0]
+                return results
             error_msg = f"Translation failed: {str(e)}"
             if self.progress_callback:
                 self.progress_callback(error_msg)
-            return f"[AUTO] {text}"
+            self.failures += len(pending)
+            return [f"[AUTO] {text}" if text.strip() else text for text in texts]
+
+    def translate_many(self, texts):
+        """Translate strings in length-bucketed batches, returning them in input order
+
+        Strings already in the translation memory are not sent to the model
+        """
+        texts = list(texts)
+        results = [None] * len(texts)
+        remembered = self.memory.lookup("transformers", self.model_name, self.lang_code, texts)
+        for i, text in enumerate(texts):
+            results[i] = remembered.get(text)
+
+        order = sorted((i for i in range(len(texts)) if results[i] is None), key=lambda i: len(texts[i]))
+        total = len(order)
+        done = 0
+        if remembered and self.progress_callback:
+            self.progress_callback(f"  |   |  🧠 Translation memory: {len(remembered)} strings reused")
+        progress = ProgressThrottle(self.progress_callback, "translate", "  |   |  🌍 Translation", total) if self.progress_callback else None
+
+        for start in range(0, total, self.batch_size):
+            bucket = order[start:start + self.batch_size]
+            learned = {}
+            for i, translated in zip(bucket, self.translate_batch([texts[i] for i in bucket])):
+                results[i] = translated
+                if texts[i].strip() and translated != f"[AUTO] {texts[i]}":
+                    learned[texts[i]] = translated
+            self.memory.store("transformers", self.model_name, self.lang_code, learned)
+            done += len(bucket)
+
+            if progress:
+                progress.update(done)
+
+        return results
     
     def parse_localization_file(self, file_path):
-        """Parse file into (variables, lines) with structure preserved"""
-        variables = set()
-        lines = []
-        total_lines = 0
-        
-        # First count total lines
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                total_lines += 1
-        
-        # Reread and parse with progress
-        processed = 0
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.rstrip('\n')
-                # Flexible matching for variables
-                if match := re.match(r'^\s*([A-Z0-9_]+)\s*=.*$', line):
-                    var = match.group(1)
-                    variables.add(var)
-                lines.append(line)
-                
-                processed += 1
-                if self.progress_callback and processed % 10 == 0:
-                    percent = int(processed / total_lines * 100)
-                    self.progress_callback(f"  |   |   |  Progress: {processed}/{total_lines} ({percent}%)")
-        
-        return variables, lines
+        """Parse file into a LocalizationFile index with structure preserved"""
+        return load_localization_file(file_path)
 
-    def accurate_parse(self, lines, label=""):
-        """Perform precise parsing of localization file lines"""
-        vars = set()
-        total = len(lines)
-        
-        for i, line in enumerate(lines):
-            # More robust matching that handles various formatting cases
-            if match := re.match(r'^\s*([A-Z0-9_]+)\s*=.*$', line):
-                var = match.group(1)
-                vars.add(var)
-            
-            # Progress reporting
-            if self.progress_callback and i % 10 == 0:
-                percent = int((i + 1) / total * 100)
-                self.progress_callback(f"  |   |  🔍 Scan ({label}): {i+1}/{total} ({percent}%)")
-        
-        return vars
+    def process_file(self, template_path, target_path, write=True, template=None):
+        """Main processing function with verification and progress callbacks
 
-    def process_file(self, template_path, target_path):
-        """Main processing function with verification and progress callbacks"""
+        Returns the updated file content; it is written back to target_path unless write is False.
+        template can be an already parsed LocalizationFile of template_path (see load_localization_file)
+        """
         template_path = Path(template_path)
         target_path = Path(target_path)
         
-        # Parse files with progress
-        self.progress_callback("  |   |  📝 Analyzing template file...")
-        template_vars, template_lines = self.parse_localization_file(template_path)
+        # Parse files once, every phase below works on their index
+        if template is None:
+            self.progress_callback("  |   |  📝 Analyzing template file...")
+            template = self.parse_localization_file(template_path)
         
         self.progress_callback("  |   |  📝 Analyzing target file...")
-        target_vars, target_lines = self.parse_localization_file(target_path)
+        target = self.parse_localization_file(target_path)
 
-        self.progress_callback("  |   |  🔍 Precise scan of target file...")
-        target_vars = self.accurate_parse(target_lines, "target")
-        
+        template_vars = template.index.keys()
+        target_vars = target.index.keys()
         missing_vars = template_vars - target_vars
         extra_vars = target_vars - template_vars
         self.progress_callback(f"  |   |  🔍 Precise scan: {len(missing_vars)} missing, {len(extra_vars)} extra")
         
-        # Create new content for target file
-        new_lines = []
-        var_order = []
-        total_template = len(template_lines)
-        for i, line in enumerate(template_lines):
-            if match := re.match(r'^\s*([A-Z0-9_]+)\s*=.*$', line):
-                var_order.append(match.group(1))
-            if self.progress_callback and i % 10 == 0:
-                percent = int((i + 1) / total_template * 100)
-                self.progress_callback(f"  |  |  📋 Preparing variable order: {i+1}/{total_template} ({percent}%)")
-        
-        # Build new file content
-        output_vars = set()
-        total_target = len(target_lines)
-        for i, line in enumerate(target_lines):
-            if match := re.match(r'^\s*([A-Z0-9_]+)\s*=.*$', line):
-                var = match.group(1)
-                if var in template_vars:
-                    new_lines.append(line)
-                    output_vars.add(var)
-            else:
-                new_lines.append(line)
-                
-            if self.progress_callback and i % 10 == 0:
-                percent = int((i + 1) / total_target * 100)
-                self.progress_callback(f"  |   |  📝 Building new content: {i+1}/{total_target} ({percent}%)")
+        # Keep target lines, minus variables the template no longer has
+        new_lines = [
+            line for line, var in zip(target.lines, target.keys)
+            if var is None or var in template.index
+        ]
         
         # Add missing variables with translations
         added_count = 0
@@ -202,36 +276,38 @@ class WorldEditorTranslator:
         
         self.progress_callback(f"  |   |  🌍 Translating {total_missing} missing variables...")
         
-        for i, var in enumerate(var_order):
-            if var not in output_vars and var in missing_vars:
-                # Find original line in template
-                original_line = next((line for line in template_lines 
-                                    if re.match(rf'^\s*{var}\s*=.*$', line)), None)
-                if original_line:
-                    if match := re.match(r'^\s*[A-Z0-9_]+\s*=\s*"(.*)"\s*$', original_line):
-                        text_to_translate = match.group(1)
-                        # Progress callback
-                        translated = self.translate_text(text_to_translate)
-                        new_lines.append(f'{var}="{translated}"')
-                    else:
-                        new_lines.append(original_line)
-                    added_count += 1
-                    output_vars.add(var)
-                
-                if self.progress_callback and (i % 1 == 0 or i == total_missing - 1):
-                    percent = int((i + 1) / total_missing * 100)
-                    self.progress_callback(f"  |   |  🌍 Translation: {i+1}/{total_missing} ({percent}%)")
+        # Collect the missing entries first (in template order) so the model sees them in batches
+        missing_entries = []
+        texts_to_translate = []
+        for var, (line_index, value) in template.index.items():
+            if var in missing_vars:
+                if value is not None:
+                    missing_entries.append((var, len(texts_to_translate)))
+                    texts_to_translate.append(value)
+                else:
+                    missing_entries.append((var, template.lines[line_index]))
+
+        translations = self.translate_many(texts_to_translate)
+
+        # Splice translations back in template order
+        for var, entry in missing_entries:
+            if isinstance(entry, int):
+                new_lines.append(f'{var}="{translations[entry]}"')
+            else:
+                new_lines.append(entry)
+            added_count += 1
         
         # Write new file
-        self.progress_callback(f"  |   |  💾 Writing updated file: {target_path.name}")
-        with open(target_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(new_lines) + '\n')
+        content = '\n'.join(new_lines) + '\n'
+        if write:
+            self.progress_callback(f"  |   |  💾 Writing updated file: {target_path.name}")
+            with open(target_path, 'w', encoding='utf-8') as f:
+                f.write(content)
         
-        # Final verification
-        # self.progress_callback("  |   |  🔍 Final verification...")
-        final_vars = self.accurate_parse(new_lines, "final")
-        remaining_missing = template_vars - final_vars
-        remaining_extra = final_vars - template_vars
+        # Final verification, on the variables the written content actually defines
+        output_vars = parse_localization_text(content).index.keys()
+        remaining_missing = template_vars - output_vars
+        remaining_extra = output_vars - template_vars
         
         summary = [
             f"  |   |  📊 Final results:",
@@ -252,4 +328,6 @@ class WorldEditorTranslator:
         if remaining_extra:
             extra_list = "\n".join([f"  {var}" for var in sorted(remaining_extra)])
             if self.progress_callback:
-                self.progress_callback(f"  |   |  ⚠️ Unexpected extra variables:\n{extra_list}")  
+                self.progress_callback(f"  |   |  ⚠️ Unexpected extra variables:\n{extra_list}")
+
+        return content
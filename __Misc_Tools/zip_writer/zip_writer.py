@@ -0,0 +1,169 @@
+import os
+import time
+import zlib
+import shutil
+from pathlib import PurePosixPath
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import ZipFile, ZipInfo, ZIP_STORED, ZIP_DEFLATED, ZIP64_LIMIT
+
+# Deflate level per extension, None meaning the member is stored as-is.
+# Audio, images and maps are already compressed: deflating them only burns CPU.
+COMPRESSION_POLICY = {
+    ".mp3": None, ".ogg": None, ".flac": None,
+    ".blp": None, ".dds": None, ".png": None, ".jpg": None, ".jpeg": None,
+    ".w3m": None, ".w3x": None, ".w3n": None, ".mpq": None, ".zip": None,
+    ".txt": 9, ".fdf": 9, ".slk": 9, ".toc": 9, ".ini": 9, ".j": 9, ".ai": 9,
+    ".wts": 9, ".mdl": 9, ".xml": 9, ".json": 9,
+}
+
+DEFAULT_COMPRESSION_LEVEL = 6
+
+# Members bigger than this are deflated by the writing thread in a streaming way
+# instead of being loaded whole into memory for a worker
+MAX_PARALLEL_MEMBER_SIZE = 64 * 1024 * 1024
+
+def compression_level(arcname, policy=None):
+    """Deflate level for a member name, or None to store it"""
+    policy = COMPRESSION_POLICY if policy is None else policy
+    return policy.get(PurePosixPath(arcname).suffix.lower(), DEFAULT_COMPRESSION_LEVEL)
+
+def _zipinfo(arcname, stat):
+    """ZipInfo.from_file built from an already known stat"""
+    zinfo = ZipInfo(arcname, time.localtime(stat.st_mtime)[:6])
+    zinfo.external_attr = (stat.st_mode & 0xFFFF) << 16
+    zinfo.file_size = stat.st_size
+    return zinfo
+
+def _deflate(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), zlib.crc32(data)
+
+class ParallelZipWriter:
+    """
+    Write a zip archive whose deflated members are compressed on a thread pool
+
+    Worker threads deflate members while the calling thread writes finished ones to the
+    archive; zlib releases the GIL so compression uses every core. Members are written in
+    the order they were added (a stored member waits for the deflated ones before it), so
+    the same inputs always give the same archive.
+
+    Args:
+        zip_path: Archive to create
+        policy: Extension -> deflate level (None to store), see COMPRESSION_POLICY
+        workers: Compression threads (defaults to the CPU count)
+        max_inflight_bytes: Upper bound of uncompressed bytes queued for compression
+    """
+    def __init__(self, zip_path, policy=None, workers=None, max_inflight_bytes=256 * 1024 * 1024):
+        self.zip_path = zip_path
+        self.policy = policy
+        self.workers = workers or os.cpu_count() or 1
+        self.max_inflight_bytes = max_inflight_bytes
+        self._zipf = None
+        self._pool = None
+        self._pending = deque()
+        self._inflight = 0
+
+    def __enter__(self):
+        self._zipf = ZipFile(self.zip_path, 'w')
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._drain()
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._zipf.close()
+        return False
+
+    def add_file(self, src, arcname, stat=None):
+        """Add a file from disk, reusing its stat when the caller already has it"""
+        level = compression_level(arcname, self.policy)
+        zinfo = _zipinfo(arcname, stat if stat is not None else os.stat(src))
+        size = zinfo.file_size
+        if level is None:
+            zinfo.compress_type = ZIP_STORED
+            self._queue(zinfo, 0, lambda: self._write_stored_file(zinfo, src))
+        elif size > MAX_PARALLEL_MEMBER_SIZE:
+            self._queue(zinfo, 0, lambda: self._zipf.write(src, arcname, compress_type=ZIP_DEFLATED,
+                                                           compresslevel=level))
+        else:
+            def job():
+                with open(src, 'rb') as f:
+                    data = f.read()
+                return len(data), _deflate(data, level)
+
+            self._submit(zinfo, size, job)
+        self._drain(self.max_inflight_bytes)
+
+    def add_bytes(self, arcname, data, mtime=None):
+        """Add an in-memory member, dated mtime (a timestamp, now by default)"""
+        level = compression_level(arcname, self.policy)
+        zinfo = ZipInfo(arcname, date_time=time.localtime(time.time() if mtime is None else mtime)[:6])
+        zinfo.external_attr = 0o600 << 16
+        if level is None:
+            zinfo.compress_type = ZIP_STORED
+            self._queue(zinfo, len(data), lambda: self._zipf.writestr(zinfo, data))
+        else:
+            self._submit(zinfo, len(data), lambda: (len(data), _deflate(data, level)))
+        self._drain(self.max_inflight_bytes)
+
+    def _queue(self, zinfo, size, write):
+        """Queue a member written by the calling thread once the members before it are"""
+        self._pending.append((zinfo, size, None, write))
+        self._inflight += size
+
+    def _submit(self, zinfo, size, job):
+        self._pending.append((zinfo, size, self._pool.submit(job), None))
+        self._inflight += size
+
+    def _drain(self, max_inflight=None):
+        """
+        Write members in order as long as they are ready, waiting for the oldest while
+        over max_inflight (for every member when None)
+        """
+        while self._pending:
+            zinfo, size, future, write = self._pending[0]
+            if (future is not None and not future.done()
+                    and max_inflight is not None and self._inflight <= max_inflight):
+                return
+            self._pending.popleft()
+            if future is None:
+                write()
+            else:
+                file_size, (payload, crc) = future.result()
+                self._write_deflated(zinfo, file_size, payload, crc)
+            self._inflight -= size
+
+    def _write_stored_file(self, zinfo, src):
+        with open(src, 'rb') as fsrc, self._zipf.open(zinfo, 'w') as fdest:
+            shutil.copyfileobj(fsrc, fdest, 1024 * 1024)
+
+    def _write_deflated(self, zinfo, file_size, payload, crc):
+        """
+        Append an already deflated member (same steps as ZipFile.open(..., 'w') + close)
+
+        zipfile has no public way to add pre-compressed data, so this relies on ZipFile
+        internals; tests/test_zip_writer.py round-trips archives to catch CPython changes.
+        """
+        zipf = self._zipf
+        zinfo.compress_type = ZIP_DEFLATED
+        zinfo.file_size = file_size
+        zinfo.compress_size = len(payload)
+        zinfo.CRC = crc
+        zinfo.flag_bits = 0x00
+        if not zinfo.external_attr:
+            zinfo.external_attr = 0o600 << 16
+
+        zip64 = file_size > ZIP64_LIMIT or len(payload) > ZIP64_LIMIT
+        zipf.fp.seek(zipf.start_dir)
+        zinfo.header_offset = zipf.fp.tell()
+        zipf._writecheck(zinfo)
+        zipf._didModify = True
+        zipf.fp.write(zinfo.FileHeader(zip64))
+        zipf.fp.write(payload)
+        zipf.start_dir = zipf.fp.tell()
+        zipf.filelist.append(zinfo)
+        zipf.NameToInfo[zinfo.filename] = zinfo
@@ -0,0 +1,165 @@
+"""
+Headless patch builder
+
+Runs the same MPQ -> CASC conversion and patch build as the patcher window, without
+PyQt5 or OpenGL, so patches can be built on servers.
+
+    python build_cli.py frFR deDE --workers 2
+    python build_cli.py --json > build.jsonl
+    python build_cli.py frFR --trace traces --memory
+
+Exit codes: 0 every region built, 1 at least one region failed, 2 bad arguments
+"""
+import sys
+import os
+import re
+import json
+import time
+import argparse
+from pathlib import Path
+
+# Get current script's directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from __Misc_Tools.build_scheduler.build_scheduler import BuildScheduler
+from __Misc_Tools.file_transfer.file_transfer import TRANSFER_MODES
+from __Misc_Tools.progress_events.progress_events import ProgressEvent
+from __Misc_Tools.build_trace.build_trace import TRACE_DIR_ENV, merge_traces
+from __Misc_Tools.memory_profile.memory_profile import MEMORY_PROFILE_ENV
+
+EXIT_OK = 0
+EXIT_BUILD_FAILED = 1
+EXIT_USAGE = 2
+
+def detect_regions(base_dir):
+    """Region codes that have an MPQ_Data/<region>-MPQ folder"""
+    mpq_base = Path(base_dir) / "MPQ_Data"
+    if not mpq_base.is_dir():
+        return []
+    return sorted(
+        folder.name[:-len("-MPQ")]
+        for folder in mpq_base.iterdir()
+        if folder.is_dir() and re.fullmatch(r"[a-zA-Z]{4}-MPQ", folder.name)
+    )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build WC3 language patches without the GUI")
+    parser.add_argument("regions", nargs="*",
+                        help="Region codes to build (e.g. frFR deDE), every MPQ_Data region by default")
+    parser.add_argument("--base-dir", default=current_dir,
+                        help="Folder holding MPQ_Data, CASC_Data and _HomeMade_Data")
+    parser.add_argument("--workers", type=int, default=1, help="Regions built at once")
+    parser.add_argument("--io-slots", type=int, default=None,
+                        help="Regions allowed in a copy/convert/zip stage at once (defaults to workers)")
+    parser.add_argument("--translation-slots", type=int, default=1,
+                        help="Regions allowed to run translation models at once")
+    parser.add_argument("--stream", action="store_true",
+                        help="Write patches directly into their zip, without staging folders")
+    parser.add_argument("--transfer-mode", choices=TRANSFER_MODES, default="auto",
+                        help="How staged files are placed")
+    parser.add_argument("--skip-unchanged", action="store_true",
+                        help="Keep staged files left by an interrupted build when size and mtime still match")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Strings sent to the translation model per call (default 16)")
+    parser.add_argument("--trace", metavar="DIR", default=None,
+                        help="Write per-stage timing traces (Chrome/Perfetto JSON) and summaries to DIR")
+    parser.add_argument("--memory", action="store_true",
+                        help="With --trace, also report the peak memory of every stage (slower)")
+    parser.add_argument("--json", action="store_true",
+                        help="Print one JSON object per line instead of text")
+    args = parser.parse_args(argv)
+    if args.memory and not args.trace:
+        parser.error("--memory needs --trace DIR to write its report")
+    if args.batch_size is not None and args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    return args
+
+def json_stdout():
+    """Keep stdout for JSON lines only: anything else printed (also by build workers) goes to stderr"""
+    sys.stdout.flush()
+    stream = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return stream
+
+def collect_traces(trace_dir, regions, since):
+    """Merge the region traces written since the build started into one build trace"""
+    trace_dir = Path(trace_dir)
+    trace_paths = sorted(
+        trace_path
+        for region in regions
+        for trace_path in trace_dir.glob(f"{region}_*.trace.json")
+        if trace_path.stat().st_mtime >= since
+    )
+    if not trace_paths:
+        return None
+    return merge_traces(trace_paths, trace_dir / f"build_{time.strftime('%Y%m%d_%H%M%S')}.json")
+
+def emit(out, as_json, event, **fields):
+    message = fields.get("message")
+    if isinstance(message, ProgressEvent):
+        fields.update(stage=message.stage, done=message.done, total=message.total, message=str(message))
+    if as_json:
+        print(json.dumps({"event": event, **fields}, ensure_ascii=False), file=out, flush=True)
+    elif event == "progress":
+        print(f"[{fields['region']}] {fields['message']}", file=out, flush=True)
+    elif event == "error":
+        print(f"⛔ {fields['message']}", file=sys.stderr, flush=True)
+    elif event == "trace":
+        print(f"⏱️ Build trace: {fields['path']}", file=out, flush=True)
+    elif event == "result":
+        for region, success in fields["results"].items():
+            print(f"{'✅' if success else '⛔'} {region}", file=out, flush=True)
+        print(f"⏱️ Finished in {fields['elapsed']:.1f}s", file=out, flush=True)
+
+def main(argv=None):
+    args = parse_args(argv)
+    base_dir = Path(args.base_dir).resolve()
+    out = json_stdout() if args.json else sys.stdout
+
+    regions = args.regions or detect_regions(base_dir)
+    if not regions:
+        emit(out, args.json, "error", message=f"No region to build in {base_dir / 'MPQ_Data'}")
+        return EXIT_USAGE
+
+    region_paths = []
+    for region in regions:
+        mpq_path = base_dir / "MPQ_Data" / f"{region}-MPQ"
+        if not mpq_path.is_dir():
+            emit(out, args.json, "error", message=f"MPQ folder not found: {mpq_path}")
+            return EXIT_USAGE
+        region_paths.append((region, str(mpq_path)))
+
+    if args.trace:
+        # Inherited by the build worker processes
+        os.environ[TRACE_DIR_ENV] = str(Path(args.trace).resolve())
+        if args.memory:
+            os.environ[MEMORY_PROFILE_ENV] = "1"
+
+    scheduler = BuildScheduler(
+        workers=args.workers,
+        io_slots=args.io_slots,
+        translation_slots=args.translation_slots,
+        stream_to_zip=args.stream,
+        transfer_mode=args.transfer_mode,
+        skip_unchanged=args.skip_unchanged,
+        batch_size=args.batch_size,
+    )
+    emit(out, args.json, "start", regions=regions, workers=scheduler.workers)
+
+    started = time.perf_counter()
+    started_at = time.time()
+    results = scheduler.run(
+        region_paths,
+        lambda region, message: emit(out, args.json, "progress", region=region, message=message),
+    )
+    if args.trace:
+        trace_path = collect_traces(os.environ[TRACE_DIR_ENV], regions, started_at)
+        if trace_path:
+            emit(out, args.json, "trace", path=str(trace_path))
+    emit(out, args.json, "result", results=results, elapsed=round(time.perf_counter() - started, 3))
+
+    return EXIT_OK if results and all(results.values()) else EXIT_BUILD_FAILED
+
+if __name__ == "__main__":
+    sys.exit(main())
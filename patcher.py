@@ -2,10 +2,19 @@
 import sys
 import os
 import shutil
+import time
+import queue
+import logging
+import logging.handlers
+from collections import deque
 from pathlib import Path
 
-# Third-party
-import re
+# Measured from here to the first shown window
+STARTUP_STARTED = time.perf_counter()
+STARTUP_BUDGET_MS = 3000
+
+# Libraries only a build needs; they must not be loaded while the window starts
+HEAVY_MODULES = ("transformers", "torch", "deep_translator")
 
 # PyQt5
 from PyQt5.QtWidgets import *
@@ -14,35 +23,12 @@ from PyQt5.QtGui import *
 from PyQt5.QtMultimedia import QMediaPlayer, QMediaPlaylist, QMediaContent
 from PyQt5.QtCore import QUrl
 
-# OpenGL
-from OpenGL.GL import *
-from OpenGL.GLU import *
-
 # Get current script's directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
 # Add to Python path (insert at beginning for priority)
 sys.path.insert(0, current_dir)
 
-# Create __init__.py files if missing
-misc_tools_dirs = [
-    os.path.join(current_dir, "__Misc_Tools"),
-    os.path.join(current_dir, "__Misc_Tools", "patches_maker"),
-    os.path.join(current_dir, "__Misc_Tools", "mpq_to_casc_converter"),
-    os.path.join(current_dir, "__Misc_Tools", "campaignstrings_translator"),
-    os.path.join(current_dir, "__Misc_Tools", "worldeditor_translator")
-]
-
-for directory in misc_tools_dirs:
-    init_path = os.path.join(directory, "__init__.py")
-    # Create directory if it doesn't exist
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-    # Create __init__.py if it doesn't exist
-    if not os.path.exists(init_path):
-        with open(init_path, 'w') as f:
-            pass  # create empty file
-
 os.environ['QT_AUTO_SCREEN_SCALE_FACTOR'] = '1'
 
 # Language codes list (ISO 639-1)
@@ -55,42 +41,128 @@ from io import StringIO
 
 from OpenGLWorldEditor import OpenGLWidget, ModelObject, LightObject, StarBackground, MainWindow
 
-# Import patches_maker with correct path
-sys.path.append(os.path.join(current_dir, "__Misc_Tools", "patches_maker"))
-from __Misc_Tools.patches_maker.patches_maker import build_patch_for_region
-
-# Import mpq_to_casc_converter
-sys.path.append(os.path.join(current_dir, "__Misc_Tools", "mpq_to_casc_converter"))
-from __Misc_Tools.mpq_to_casc_converter.mpq_to_casc_converter import convert_mpq_to_casc
+# Import build_scheduler (runs convert_mpq_to_casc + build_patch_for_region per region)
+sys.path.append(os.path.join(current_dir, "__Misc_Tools", "build_scheduler"))
+from __Misc_Tools.build_scheduler.build_scheduler import BuildScheduler
+from __Misc_Tools.progress_events.progress_events import ProgressEvent
+
+# Console lines kept in memory; the complete log goes to LOG_FILE
+LOG_MAX_LINES = 5000
+LOG_FLUSH_INTERVAL_MS = 50
+LOG_FILE = Path(current_dir) / "logs" / "patcher.log"
+
+class LogModel(QAbstractListModel):
+    """
+    Ring buffer of console lines for a QListView
+
+    Lines are queued and added to the model in one batch per timer tick. A line coming
+    with the same progress key as the last one replaces it instead of being appended.
+    """
+    def __init__(self, max_lines=LOG_MAX_LINES, parent=None):
+        super().__init__(parent)
+        self._lines = deque()
+        self._max_lines = max_lines
+        self._last_key = None
+        self._pending = []
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(LOG_FLUSH_INTERVAL_MS)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._lines)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self._lines[index.row()]
+        return None
+
+    def add(self, text, key=None):
+        """Queue a line; key identifies a progress line that later lines with the same key replace"""
+        self._pending.append((key, text))
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        # Coalesce the batch first: consecutive lines with the same key keep only the last one
+        replace_last = None
+        new_lines = []
+        last_key = self._last_key
+        for key, text in pending:
+            if key is not None and key == last_key:
+                if new_lines:
+                    new_lines[-1] = text
+                elif self._lines:
+                    replace_last = text
+                else:
+                    new_lines.append(text)
+            else:
+                new_lines.append(text)
+            last_key = key
+        self._last_key = last_key
+
+        if replace_last is not None:
+            self._lines[-1] = replace_last
+            last_row = self.index(len(self._lines) - 1)
+            self.dataChanged.emit(last_row, last_row)
+
+        new_lines = new_lines[-self._max_lines:]
+        overflow = min(len(self._lines), len(self._lines) + len(new_lines) - self._max_lines)
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._lines.popleft()
+            self.endRemoveRows()
+
+        if new_lines:
+            first = len(self._lines)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_lines) - 1)
+            self._lines.extend(new_lines)
+            self.endInsertRows()
 
 class RegionProcessor(QThread):
-    progress = pyqtSignal(str)
+    progress = pyqtSignal(object)
     finished = pyqtSignal()
     error = pyqtSignal(str)
 
-    def __init__(self, mpq_path, lang):
+    def __init__(self, regions, stream_to_zip=False, workers=1, io_slots=None, translation_slots=1,
+                 skip_unchanged=False):
         super().__init__()
-        self.mpq_path = mpq_path
-        self.lang = lang
+        self.regions = regions
+        self.scheduler = BuildScheduler(
+            workers=workers,
+            io_slots=io_slots,
+            translation_slots=translation_slots,
+            stream_to_zip=stream_to_zip,
+            skip_unchanged=skip_unchanged,
+        )
         self.last_progress = ""
 
     def run(self):
+        # Tag messages with their region once several regions are built side by side
+        tag_regions = len(self.regions) > 1 and self.scheduler.workers > 1
+
         # Define progress callback that emits to main thread
-        def progress_callback(message):
+        def progress_callback(lang, message):
+            if tag_regions and isinstance(message, ProgressEvent):
+                message = message._replace(message=f"[{lang}] {message.message}")
+            elif tag_regions:
+                message = f"[{lang}] {message}"
             self.progress.emit(message)
             self.last_progress = message
 
-        # Process the region with our callback
-        convert_mpq_to_casc(
-            region_folder_path=self.mpq_path,
-            progress_callback=progress_callback
-        )
+        try:
+            results = self.scheduler.run(self.regions, progress_callback)
+        except Exception as e:
+            self.error.emit(f"⛔ Build scheduler failed: {str(e)}")
+            results = {}
 
-        # Create patch for this region
-        build_patch_for_region(
-            progress_callback=progress_callback,
-            mpq_to_casc_path=self.mpq_path + "-converted-to-CASC",
-        )
+        failed = [lang for lang, ok in results.items() if not ok]
+        if failed:
+            self.error.emit(f"⚠️ Patch failed for: {', '.join(failed)}")
 
         # Emit final result
         self.finished.emit()
@@ -169,13 +241,47 @@ class CustomMainWindow(QMainWindow):
             }
             QPushButton:hover { background-color: #45a049; }
         """)
+        # Build Settings Group
+        build_group = QGroupBox("Build Settings")
+        build_layout = QHBoxLayout()
+        cpu_count = os.cpu_count() or 1
+        self.workers_spin = self._add_build_spinbox(build_layout, "Workers:", "build_workers", cpu_count, cpu_count)
+        self.io_slots_spin = self._add_build_spinbox(build_layout, "I/O:", "build_io_slots", cpu_count, cpu_count)
+        self.translation_slots_spin = self._add_build_spinbox(build_layout, "Translation:", "build_translation_slots", 1, cpu_count)
+        build_group.setLayout(build_layout)
+        right_layout.addWidget(build_group)
+
         right_layout.addWidget(self.patch_button)
-        
-        # Console Log
-        self.console_log = QTextEdit()
-        self.console_log.setReadOnly(True)
+
+        # Direct-to-zip build option (no staging folders on disk)
+        self.stream_checkbox = QCheckBox("Write patch directly into the zip (no staging folders)")
+        self.stream_checkbox.setChecked(self.settings.value("stream_to_zip", False, type=bool))
+        self.stream_checkbox.stateChanged.connect(
+            lambda state: self.settings.setValue("stream_to_zip", state == Qt.Checked)
+        )
+        right_layout.addWidget(self.stream_checkbox)
+
+        # Keep staged files an interrupted build already copied (size and mtime unchanged)
+        self.skip_unchanged_checkbox = QCheckBox("Skip staged files that are already up to date")
+        self.skip_unchanged_checkbox.setChecked(self.settings.value("skip_unchanged", False, type=bool))
+        self.skip_unchanged_checkbox.stateChanged.connect(
+            lambda state: self.settings.setValue("skip_unchanged", state == Qt.Checked)
+        )
+        right_layout.addWidget(self.skip_unchanged_checkbox)
+        
+        # Console Log (only the visible lines of the last LOG_MAX_LINES are rendered)
+        self.log_model = LogModel(parent=self)
+        self.console_log = QListView()
+        self.console_log.setModel(self.log_model)
+        self.console_log.setUniformItemSizes(True)
+        self.console_log.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.console_log.setMinimumHeight(100)
+        self.log_model.rowsInserted.connect(self._follow_log)
+        self._log_at_bottom = True
+        self.console_log.verticalScrollBar().valueChanged.connect(self._track_log_scroll)
+        QShortcut(QKeySequence.Copy, self.console_log, activated=self._copy_log_selection)
         right_layout.addWidget(self.console_log)
+        self._start_log_file()
         
         # Add right panel to splitter
         self.splitter.addWidget(right_panel)
@@ -242,6 +348,16 @@ class CustomMainWindow(QMainWindow):
         # Initialize media player
         self.init_background_music()
 
+    def _add_build_spinbox(self, layout, label, setting_key, default, maximum):
+        """Add a labelled spin box bound to a persisted build setting"""
+        spinbox = QSpinBox()
+        spinbox.setRange(1, maximum)
+        spinbox.setValue(min(self.settings.value(setting_key, default, type=int), maximum))
+        spinbox.valueChanged.connect(lambda value: self.settings.setValue(setting_key, value))
+        layout.addWidget(QLabel(label), 0)
+        layout.addWidget(spinbox, 1)
+        return spinbox
+
     def init_background_music(self):
         """Initialize dual players with synchronized playback"""
         try:
@@ -439,6 +555,11 @@ class CustomMainWindow(QMainWindow):
                         shutil.rmtree(converted_casc_path)
                         #self.log_message(f"Deleted converted CASC folder: {converted_casc_path}")
                     
+                    # Delete the persisted MPQ file index if it exists
+                    mpq_index_file = os.path.join(self.base_path, "MPQ_Data", f"{lang}-MPQ.index.json")
+                    if os.path.exists(mpq_index_file):
+                        os.remove(mpq_index_file)
+
                     # Delete the MPQ folder
                     if os.path.exists(mpq_path):
                         shutil.rmtree(mpq_path)
@@ -575,12 +696,35 @@ class CustomMainWindow(QMainWindow):
             self.set_ui_enabled(True)
             return
         
-        # Start processing
-        self.process_next_language()
+        for lang, rel_mpq_path in self.languages_to_process:
+            self.log_message(f"Queued language: {lang} ({rel_mpq_path})")
+
+        # Start processing all regions through the build scheduler
+        regions = [
+            (lang, os.path.join(self.base_path, rel_mpq_path))
+            for lang, rel_mpq_path in self.languages_to_process
+        ]
+        self.worker = RegionProcessor(
+            regions,
+            stream_to_zip=self.stream_checkbox.isChecked(),
+            workers=self.workers_spin.value(),
+            io_slots=self.io_slots_spin.value(),
+            translation_slots=self.translation_slots_spin.value(),
+            skip_unchanged=self.skip_unchanged_checkbox.isChecked(),
+        )
+        self.worker.progress.connect(self.log_message)
+        self.worker.error.connect(self.log_message)
+        self.worker.finished.connect(self.on_build_finished)
+        self.worker.start()
 
     def set_ui_enabled(self, enabled):
         """Enable/disable UI elements during processing and update styles"""
         self.patch_button.setEnabled(enabled)
+        self.stream_checkbox.setEnabled(enabled)
+        self.skip_unchanged_checkbox.setEnabled(enabled)
+        self.workers_spin.setEnabled(enabled)
+        self.io_slots_spin.setEnabled(enabled)
+        self.translation_slots_spin.setEnabled(enabled)
         self.add_button.setEnabled(enabled)
         self.remove_button.setEnabled(enabled)
         self.lang_table.setEnabled(enabled)
@@ -611,65 +755,58 @@ class CustomMainWindow(QMainWindow):
                 /* No hover effect when disabled */
             """)
 
-    def process_next_language(self):
-        if not self.languages_to_process:
-            self.set_ui_enabled(True)
-            self.log_message("Patch completed for selected languages!")
-            self.log_message("")
-            return
-        
-        lang, rel_mpq_path = self.languages_to_process.pop(0)
-        mpq_path = os.path.join(self.base_path, rel_mpq_path)
-        
-        self.log_message(f"\nProcessing language: {lang}")
-        self.log_message(f"MPQ Path: {rel_mpq_path}")
-        
-        # Create and start worker
-        self.worker = RegionProcessor(mpq_path, lang)
-        self.worker.progress.connect(self.log_message)
-        self.worker.error.connect(self.log_message)
-        self.worker.finished.connect(self.process_next_language)
-        self.worker.start()
+    def on_build_finished(self):
+        self.set_ui_enabled(True)
+        self.log_message("Patch completed for selected languages!")
+        self.log_message("")
 
     def save_settings(self):
         serializable = [(lang, ignore, mpq, casc) for lang, ignore, mpq, casc in self.selected_languages]
         self.settings.setValue("selected_languages", serializable)
 
+    def _start_log_file(self):
+        """Write the complete log to a rotating file from a background thread"""
+        LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=3, encoding='utf-8'
+        )
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        log_queue = queue.SimpleQueue()
+        self.log_listener = logging.handlers.QueueListener(log_queue, file_handler)
+        self.log_listener.start()
+
+        self.file_logger = logging.getLogger("patcher.console")
+        self.file_logger.setLevel(logging.INFO)
+        self.file_logger.propagate = False
+        self.file_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    def _track_log_scroll(self, value):
+        self._log_at_bottom = value >= self.console_log.verticalScrollBar().maximum()
+
+    def _copy_log_selection(self):
+        rows = sorted(index.row() for index in self.console_log.selectionModel().selectedIndexes())
+        QApplication.clipboard().setText("\n".join(self.log_model.data(self.log_model.index(row)) for row in rows))
+
+    def _follow_log(self):
+        # Keep following new lines unless the user scrolled up
+        if self._log_at_bottom:
+            self.console_log.scrollToBottom()
+
+    def closeEvent(self, event):
+        self.log_listener.stop()
+        super().closeEvent(event)
+
     def log_message(self, message):
-        cursor = self.console_log.textCursor()
-        
-        # Check if this is a progress message (ends with NUMBER/NUMBER (NUMBER%))
-        is_progress = re.search(r'\d+/\d+\s+\(\d+%\)$', message) is not None
-        
-        if is_progress:
-            # Extract prefix from current message (remove progress part)
-            current_prefix = re.sub(r'\s*\d+/\d+\s+\(\d+%\)$', '', message)
-            
-            # Move to end and get last line
-            cursor.movePosition(QTextCursor.End)
-            cursor.select(QTextCursor.LineUnderCursor)
-            last_line = cursor.selectedText()
-            
-            # Check if last line is progress with matching prefix
-            last_progress_match = re.search(r'\d+/\d+\s+\(\d+%\)$', last_line)
-            if last_progress_match:
-                last_prefix = re.sub(r'\s*\d+/\d+\s+\(\d+%\)$', '', last_line)
-                if last_prefix == current_prefix:
-                    # Replace last line with new progress
-                    cursor.removeSelectedText()
-                    cursor.insertText(message)
-                    self.console_log.setTextCursor(cursor)
-                    self.console_log.ensureCursorVisible()
-                    return  # Exit after handling matched progress update
-            
-            # If no match, append as new line
-            self.console_log.append(message)
+        """Show a message in the console; a ProgressEvent replaces the previous line of the same progress"""
+        if isinstance(message, ProgressEvent):
+            key = (message.region, message.stage, message.message)
+            message = str(message)
         else:
-            # For regular messages, just append
-            self.console_log.append(message)
-            
-        self.console_log.setTextCursor(cursor)
-        self.console_log.ensureCursorVisible()
+            key = None
+
+        for line in message.split("\n"):
+            self.log_model.add(line, key)
+        self.file_logger.info(message)
 
 if __name__ == "__main__":
     if hasattr(Qt, 'AA_EnableHighDpiScaling'):
@@ -691,5 +828,14 @@ if __name__ == "__main__":
     # Create patcher window
     window = CustomMainWindow(EditorOpenGLwidget=Editorwindow.opengl_widget)
     window.show()
+
+    # Report how long the window took to appear, and any heavy library loaded on the way
+    startup_ms = int((time.perf_counter() - STARTUP_STARTED) * 1000)
+    window.log_message(f"⏱️ Startup: {startup_ms} ms (budget {STARTUP_BUDGET_MS} ms)")
+    if startup_ms > STARTUP_BUDGET_MS:
+        window.log_message("⚠️ Startup is over budget")
+    preloaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    if preloaded:
+        window.log_message(f"⚠️ Loaded at startup: {', '.join(preloaded)}")
     
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in a fresh interpreter; import attempts are recorded so the check also holds where
+# the heavy packages are not installed
+CHECK_IMPORTS = """
+import sys
+
+HEAVY = ("transformers", "torch")
+attempted = []
+
+class RecordHeavyImports:
+    def find_spec(self, name, path=None, target=None):
+        if name.split(".")[0] in HEAVY:
+            attempted.append(name)
+        return None
+
+sys.meta_path.insert(0, RecordHeavyImports())
+{before}
+import {module}
+{after}
+loaded = [name for name in sys.modules if name.split(".")[0] in HEAVY]
+print(sorted(set(attempted + loaded)))
+"""
+
+def _check_imports(module, before="", after="", env=None):
+    return subprocess.run(
+        [sys.executable, "-c", CHECK_IMPORTS.format(module=module, before=before, after=after)],
+        cwd=REPO_ROOT, capture_output=True, text=True, env=env,
+    )
+
+@pytest.mark.parametrize("module", [
+    "__Misc_Tools.build_scheduler.build_scheduler",
+    "__Misc_Tools.patches_maker.patches_maker",
+])
+def test_module_does_not_import_models(module):
+    result = _check_imports(module)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+# Replaces PyQt5 and the editor with permissive stand-ins so `patcher` imports without a
+# display; every Qt name the module uses becomes a class that accepts any call or attribute
+STUB_QT = """
+import ast
+import sys
+import types
+
+class StubMeta(type):
+    def __getattr__(cls, name):
+        return cls
+
+class Stub(metaclass=StubMeta):
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __getattr__(self, name):
+        return self
+
+names = set()
+for node in ast.walk(ast.parse(open("patcher.py", encoding="utf-8").read())):
+    if isinstance(node, ast.Name) and node.id.startswith(("Q", "pyqt")):
+        names.add(node.id)
+    elif isinstance(node, ast.alias) and node.name.startswith(("Q", "pyqt")):
+        names.add(node.name)
+
+sys.modules["PyQt5"] = types.ModuleType("PyQt5")
+for submodule in ("QtWidgets", "QtCore", "QtGui", "QtMultimedia"):
+    module = types.ModuleType(f"PyQt5.{submodule}")
+    module.__all__ = sorted(names)
+    for name in names:
+        setattr(module, name, type(name, (Stub,), {}))
+    sys.modules[module.__name__] = module
+
+editor = types.ModuleType("OpenGLWorldEditor")
+for name in ("OpenGLWidget", "ModelObject", "LightObject", "StarBackground", "MainWindow"):
+    setattr(editor, name, type(name, (Stub,), {}))
+sys.modules["OpenGLWorldEditor"] = editor
+"""
+
+# Builds the real main window on Qt's offscreen platform
+START_APP = """
+from PyQt5.QtWidgets import QApplication, QWidget
+app = QApplication([])
+"""
+SHOW_WINDOW = """
+window = patcher.CustomMainWindow(EditorOpenGLwidget=QWidget())
+window.show()
+app.processEvents()
+"""
+
+def test_patcher_import_does_not_import_models():
+    result = _check_imports("patcher", before=STUB_QT)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+def test_main_window_does_not_import_models(tmp_path):
+    pytest.importorskip("PyQt5.QtWidgets")
+    pytest.importorskip("OpenGLWorldEditor")
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", XDG_CONFIG_HOME=str(tmp_path))
+    result = _check_imports("patcher", before=START_APP, after=SHOW_WINDOW, env=env)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,95 @@
+from __Misc_Tools.model_pool import model_pool as model_pool_module
+from __Misc_Tools.model_pool.model_pool import ModelPool, MODEL_BUDGET_ENV, model_nbytes
+from __Misc_Tools.build_scheduler.build_scheduler import BuildScheduler, _init_worker
+
+MB = 1024 * 1024
+
+class FakeTensor:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+    def numel(self):
+        return self.nbytes // 4
+
+    def element_size(self):
+        return 4
+
+class FakeModel:
+    """Stands for a torch module: parameters() and buffers() of a known size"""
+    def __init__(self, parameter_mb, buffer_mb=0):
+        self._parameters = [FakeTensor(parameter_mb * MB)]
+        self._buffers = [FakeTensor(buffer_mb * MB)] if buffer_mb else []
+
+    def parameters(self):
+        return iter(self._parameters)
+
+    def buffers(self):
+        return iter(self._buffers)
+
+class FakePipeline:
+    """Stands for a transformers pipeline, whose weights are on its model attribute"""
+    def __init__(self, model):
+        self.model = model
+
+def loader(model, calls):
+    def load():
+        calls.append(model)
+        return model
+    return load
+
+def test_model_sizes():
+    assert model_nbytes(FakeModel(10, 2)) == 12 * MB
+    assert model_nbytes(FakePipeline(FakeModel(5))) == 5 * MB
+    # m2m100 models are loaded as a (model, tokenizer) pair
+    assert model_nbytes((FakeModel(7), object())) == 7 * MB
+
+def test_budget_accounting_and_reuse():
+    pool = ModelPool(100 * MB)
+    calls = []
+    fr = pool.get("fr", loader(FakeModel(30), calls))
+    pool.get("de", loader(FakeModel(40), calls))
+
+    assert pool.used_bytes() == 70 * MB
+    assert pool.get("fr", loader(FakeModel(30), calls)) is fr
+    assert len(calls) == 2
+
+def test_least_recently_used_models_are_evicted_first():
+    pool = ModelPool(100 * MB)
+    calls = []
+    pool.get("fr", loader(FakeModel(40), calls))
+    pool.get("de", loader(FakeModel(40), calls))
+    pool.get("fr", loader(FakeModel(40), calls))  # de is now the least recently used
+
+    pool.get("it", loader(FakeModel(40), calls))
+    assert pool.loaded() == ["fr", "it"]
+    assert pool.used_bytes() == 80 * MB
+
+    pool.get("ru", loader(FakeModel(70), calls))
+    assert pool.loaded() == ["ru"]
+    assert pool.used_bytes() == 70 * MB
+
+def test_model_over_budget_is_kept_alone():
+    pool = ModelPool(50 * MB)
+    calls = []
+    pool.get("fr", loader(FakeModel(20), calls))
+    pool.get("ko", loader(FakeModel(80), calls))
+    assert pool.loaded() == ["ko"]
+
+def test_clear_unloads_everything():
+    pool = ModelPool(100 * MB)
+    pool.get("fr", loader(FakeModel(20), []))
+    pool.clear()
+    assert pool.loaded() == []
+    assert pool.used_bytes() == 0
+
+def test_scheduler_splits_the_budget_between_model_processes(monkeypatch):
+    monkeypatch.setenv(MODEL_BUDGET_ENV, "3000")
+    assert BuildScheduler(workers=4, translation_slots=1).model_budget == 3000 * MB
+    assert BuildScheduler(workers=4, translation_slots=3).model_budget == 1000 * MB
+    # More slots than workers: at most one region per worker holds models
+    assert BuildScheduler(workers=2, translation_slots=8).model_budget == 1500 * MB
+
+def test_worker_pool_gets_its_share(monkeypatch):
+    monkeypatch.setattr(model_pool_module, "_model_pool", None)
+    _init_worker(512 * MB)
+    assert model_pool_module.model_pool().budget_bytes == 512 * MB
@@ -0,0 +1,80 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from __Misc_Tools.mpq_to_casc_converter.mpq_to_casc_converter import (
+    MPQ_PRIORITY, load_mpq_index, build_resolution_index, resolve_casc_path,
+)
+
+FOLDERS = ["ui", "UI", "units", "Units", "sound", "human", "orc", "footman", "abilities", "spells"]
+NAMES = ["Footman.mdx", "footman.blp", "war3skins.txt", "Button.blp", "attack.wav", "portrait.mdx"]
+
+def scored_candidate(mpq_files, rel_path):
+    """Source the converter picked before the resolution index: longest parent prefix, then priority"""
+    target_path = Path(rel_path.replace("\\", "/"))
+    filename = target_path.name.lower()
+    parent_dirs = [p.lower() for p in target_path.parent.parts]
+
+    best_candidate = None
+    best_score = -1
+    best_priority = -1
+    for candidate in mpq_files.files.get(filename, ()):
+        score = 0
+        for a, b in zip(parent_dirs, mpq_files.parts(candidate)):
+            if a == b:
+                score += 1
+            else:
+                break
+        priority = candidate[2]
+        if score > best_score or (score == best_score and priority > best_priority):
+            best_candidate = candidate
+            best_score = score
+            best_priority = priority
+    return best_candidate
+
+def random_rel_path(rng, names):
+    folders = [rng.choice(FOLDERS) for _ in range(rng.randint(0, 3))]
+    return "/".join([*folders, rng.choice(names)])
+
+def make_mpq_tree(region_folder, rng, files):
+    for _ in range(files):
+        path = region_folder / rng.choice(list(MPQ_PRIORITY)) / random_rel_path(rng, NAMES)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("data")
+
+@pytest.mark.parametrize("seed", range(5))
+def test_resolution_index_matches_scoring_loop(tmp_path, seed):
+    rng = random.Random(seed)
+    region_folder = tmp_path / "MPQ_Data" / "frFR-MPQ"
+    make_mpq_tree(region_folder, rng, files=200)
+
+    mpq_files = load_mpq_index(region_folder)
+    resolution_index = build_resolution_index(mpq_files)
+
+    queries = [random_rel_path(rng, NAMES + ["missing.txt"]) for _ in range(500)]
+    queries += [query.replace("/", "\\") for query in queries[:50]]
+    queries += [query.upper() for query in queries[:50]]
+
+    for rel_path in queries:
+        expected = scored_candidate(mpq_files, rel_path)
+        resolved = resolve_casc_path(resolution_index, rel_path)
+        if expected is None:
+            assert resolved is None, rel_path
+        else:
+            assert mpq_files.source_path(resolved) == mpq_files.source_path(expected), rel_path
+
+def test_deeper_match_beats_priority(tmp_path):
+    region_folder = tmp_path / "MPQ_Data" / "frFR-MPQ"
+    for rel_path in ("war3.mpq/Units/Human/Footman.mdx", "War3Patch.mpq/Units/Footman.mdx"):
+        path = region_folder / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("data")
+
+    mpq_files = load_mpq_index(region_folder)
+    resolution_index = build_resolution_index(mpq_files)
+
+    deep = resolve_casc_path(resolution_index, "units\\human\\footman.mdx")
+    shallow = resolve_casc_path(resolution_index, "units/orc/footman.mdx")
+    assert mpq_files.source_path(deep) == region_folder / "war3.mpq" / "Units" / "Human" / "Footman.mdx"
+    assert mpq_files.source_path(shallow) == region_folder / "War3Patch.mpq" / "Units" / "Footman.mdx"
@@ -0,0 +1,42 @@
+import ntpath
+import os
+from pathlib import PurePosixPath
+
+import pytest
+
+from __Misc_Tools.patches_maker.patches_maker import plan_overlay, copy_manifest
+
+@pytest.fixture
+def case_insensitive(monkeypatch):
+    """Merge paths the way a Windows build does"""
+    monkeypatch.setattr(os.path, "normcase", ntpath.normcase)
+
+def test_folders_differing_in_case_get_the_first_spelling(case_insensitive, tmp_path):
+    casc = {
+        PurePosixPath("units/Human/Footman.mdx"): tmp_path / "casc_footman",
+        PurePosixPath("ui/war3skins.txt"): tmp_path / "casc_skins",
+    }
+    homemade = {
+        PurePosixPath("Units/human/Footman.mdx"): tmp_path / "homemade_footman",
+        PurePosixPath("Units/HUMAN/Knight.mdx"): tmp_path / "homemade_knight",
+        PurePosixPath("UI/Glues/intro.txt"): tmp_path / "homemade_intro",
+    }
+    for src in (*casc.values(), *homemade.values()):
+        src.write_text(src.name, encoding="utf-8")
+
+    manifest = plan_overlay([casc, homemade])
+
+    assert manifest == {
+        PurePosixPath("units/Human/Footman.mdx"): tmp_path / "homemade_footman",
+        PurePosixPath("units/Human/Knight.mdx"): tmp_path / "homemade_knight",
+        PurePosixPath("ui/war3skins.txt"): tmp_path / "casc_skins",
+        PurePosixPath("ui/Glues/intro.txt"): tmp_path / "homemade_intro",
+    }
+
+    # Even on a case-sensitive filesystem, the copy creates one folder per merged folder
+    dest = tmp_path / "patch"
+    copy_manifest(manifest, dest, progress_callback=lambda message: None)
+    assert sorted(path.relative_to(dest).as_posix() for path in dest.rglob("*")) == [
+        "ui", "ui/Glues", "ui/Glues/intro.txt", "ui/war3skins.txt",
+        "units", "units/Human", "units/Human/Footman.mdx", "units/Human/Knight.mdx",
+    ]
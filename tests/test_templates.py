@@ -0,0 +1,8 @@
+from __Misc_Tools.patches_maker.patches_maker import CAMPAIGN_STRINGS_TEMPLATE, _translation_templates
+
+def test_templates_found_outside_the_repo(tmp_path, monkeypatch):
+    # Builds run from their base folder, which need not contain __Misc_Tools
+    monkeypatch.chdir(tmp_path)
+    for template in _translation_templates() + [CAMPAIGN_STRINGS_TEMPLATE]:
+        assert template.is_absolute()
+        assert template.is_file(), template
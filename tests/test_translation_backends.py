@@ -0,0 +1,130 @@
+import json
+import time
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from __Misc_Tools.translation_backends.translation_backends import (
+    HttpBackend, TokenBucket, TranslationError, run_translations,
+)
+
+class StubTranslateServer(ThreadingHTTPServer):
+    """
+    LibreTranslate-like stub: answers each POST with the next status of statuses
+    (repeating the last one), translating with 200 by upper-casing the text
+    """
+    daemon_threads = True
+
+    def __init__(self, statuses):
+        super().__init__(("127.0.0.1", 0), StubTranslateHandler)
+        self.statuses = list(statuses)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def next_status(self, text):
+        with self.lock:
+            self.requests.append((time.monotonic(), text))
+            return self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/translate"
+
+class StubTranslateHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        status = self.server.next_status(query["q"])
+        body = json.dumps({"translatedText": query["q"].upper()} if status == 200 else {"error": "stub"})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(*statuses):
+        server = StubTranslateServer(statuses)
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def translate(backend, texts, **kwargs):
+    errors = {}
+    results = run_translations(backend, texts, "en", "fr", backoff=0,
+                               on_error=lambda text, e: errors.setdefault(text, e), **kwargs)
+    return results, errors
+
+@pytest.mark.parametrize("status", [500, 503, 429])
+def test_http_backend_retries_transient_errors(stub_server, status):
+    server = stub_server(status, status, 200)
+    results, errors = translate(HttpBackend(server.url), ["hello"], retries=3)
+
+    assert results == {"hello": "HELLO"}
+    assert errors == {}
+    assert len(server.requests) == 3
+
+def test_http_backend_gives_up_after_retries(stub_server):
+    server = stub_server(503)
+    results, errors = translate(HttpBackend(server.url), ["hello"], retries=2)
+
+    assert results == {}
+    assert list(errors) == ["hello"]
+    assert len(server.requests) == 3
+
+def test_http_backend_does_not_retry_rejected_requests(stub_server):
+    server = stub_server(400)
+    results, errors = translate(HttpBackend(server.url), ["hello"], retries=3)
+
+    assert results == {}
+    assert isinstance(errors["hello"], TranslationError)
+    assert len(server.requests) == 1
+
+def test_token_bucket_limits_request_rate(stub_server):
+    server = stub_server(200)
+    backend = HttpBackend(server.url, rate=20)
+    texts = [f"text {i}" for i in range(40)]
+
+    started = time.monotonic()
+    results, errors = translate(backend, texts)
+    elapsed = time.monotonic() - started
+
+    assert len(results) == 40 and not errors
+    # A burst of 20 tokens, then 20 requests per second
+    assert elapsed >= 0.9
+    sent = sorted(sent_at for sent_at, _ in server.requests)
+    assert sum(1 for sent_at in sent if sent_at - sent[0] < 0.5) <= 31
+
+def test_token_bucket_waits_for_tokens():
+    async def acquire_all(bucket, count):
+        for _ in range(count):
+            await bucket.acquire()
+
+    bucket = TokenBucket(rate=50, capacity=1)
+    started = time.monotonic()
+    asyncio.run(acquire_all(bucket, 11))
+    assert time.monotonic() - started >= 0.19
+
+def test_backend_down_after_max_failures(stub_server):
+    server = stub_server(500)
+    backend = HttpBackend(server.url)
+    backend.concurrency = 1
+    texts = [f"text {i}" for i in range(10)]
+
+    results, errors = translate(backend, texts, retries=0, max_failures=3)
+
+    assert results == {}
+    assert set(errors) == set(texts)
+    assert len(server.requests) == 3
+    assert all("unavailable" in str(errors[text]) for text in texts[3:])
@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from __Misc_Tools.translation_memory import translation_memory
+from __Misc_Tools.translation_memory.translation_memory import (
+    TranslationMemory, TRANSLATION_MEMORY_ENV, IN_MEMORY, shared_memory, memory_path,
+)
+
+PACKAGE_DIR = Path(translation_memory.__file__).parent
+
+def test_lookup_normalizes_whitespace(tmp_path):
+    memory = TranslationMemory(tmp_path / "memory.sqlite3")
+    memory.store("google", "GoogleTranslator", "fr", {"Hello  world ": "Bonjour le monde"})
+
+    assert memory.lookup("google", "GoogleTranslator", "fr", [" Hello world", "Other"]) == {
+        " Hello world": "Bonjour le monde",
+    }
+    assert memory.lookup("google", "GoogleTranslator", "de", ["Hello world"]) == {}
+    memory.close()
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    memory = TranslationMemory(tmp_path / "memory.sqlite3", max_entries=2)
+    memory.store("noop", "", "fr", {"a": "A"})
+    memory.store("noop", "", "fr", {"b": "B"})
+    memory.lookup("noop", "", "fr", ["a"])
+    memory.store("noop", "", "fr", {"c": "C"})
+
+    assert memory.lookup("noop", "", "fr", ["a", "b", "c"]) == {"a": "A", "c": "C"}
+    memory.close()
+
+def test_builds_keep_the_memory_in_their_cache_folder(tmp_path, monkeypatch):
+    monkeypatch.delenv(TRANSLATION_MEMORY_ENV, raising=False)
+    monkeypatch.setattr(translation_memory, "_shared_memories", {})
+
+    cache_dir = tmp_path / "merged" / ".build_cache"
+    memory = shared_memory(memory_path(cache_dir))
+    assert memory is shared_memory(memory_path(cache_dir))
+    assert memory.db_path == cache_dir / "translation_memory.sqlite3"
+    assert memory.db_path.exists()
+
+    # Without a build cache nothing is written to disk, least of all next to the sources
+    assert shared_memory().db_path == IN_MEMORY
+    assert not list(PACKAGE_DIR.glob("*.sqlite3"))
+
+def test_environment_overrides_the_build_memory(tmp_path, monkeypatch):
+    override = tmp_path / "bench" / "memory.sqlite3"
+    monkeypatch.setenv(TRANSLATION_MEMORY_ENV, str(override))
+    monkeypatch.setattr(translation_memory, "_shared_memories", {})
+
+    assert shared_memory(memory_path(tmp_path / "cache")).db_path == override
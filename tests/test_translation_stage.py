@@ -0,0 +1,35 @@
+import threading
+
+from __Misc_Tools.model_pool.model_pool import model_pool
+from __Misc_Tools.patches_maker.patches_maker import translation_stage
+
+class OneTranslationSlot:
+    io = threading.BoundedSemaphore(1)
+    translation = threading.BoundedSemaphore(1)
+
+def test_next_region_does_not_keep_previous_models():
+    stage_limits = OneTranslationSlot()
+
+    with translation_stage(stage_limits):
+        model_pool().get("Helsinki-NLP/opus-mt-en-fr", lambda: "fr model")
+        assert model_pool().loaded() == ["Helsinki-NLP/opus-mt-en-fr"]
+    assert model_pool().loaded() == []
+
+    with translation_stage(stage_limits):
+        model_pool().get("Helsinki-NLP/opus-mt-en-de", lambda: "de model")
+        assert model_pool().loaded() == ["Helsinki-NLP/opus-mt-en-de"]
+    assert model_pool().loaded() == []
+
+def test_models_are_released_when_translation_fails():
+    stage_limits = OneTranslationSlot()
+
+    try:
+        with translation_stage(stage_limits):
+            model_pool().get("Helsinki-NLP/opus-mt-en-fr", lambda: "fr model")
+            raise RuntimeError("translation failed")
+    except RuntimeError:
+        pass
+    assert model_pool().loaded() == []
+    # The slot was given back as well
+    assert stage_limits.translation.acquire(blocking=False)
+    stage_limits.translation.release()
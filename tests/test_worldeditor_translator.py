@@ -0,0 +1,19 @@
+from __Misc_Tools.model_pool.model_pool import model_pool
+from __Misc_Tools.translation_memory.translation_memory import TranslationMemory
+from __Misc_Tools.worldeditor_translator.worldeditor_translator import WorldEditorTranslator
+
+def test_strings_are_sent_in_batches_of_batch_size():
+    calls = []
+
+    def translate(model, texts):
+        calls.append(len(texts))
+        return [text.upper() for text in texts]
+
+    translator = WorldEditorTranslator("frFR", batch_size=3, memory=TranslationMemory())
+    translator._translator = (lambda: "fr model", translate)
+    texts = [f"string {i}" for i in range(8)]
+    try:
+        assert translator.translate_many(texts) == [text.upper() for text in texts]
+    finally:
+        model_pool().clear()
+    assert calls == [3, 3, 2]
@@ -0,0 +1,79 @@
+import os
+import random
+import zipfile
+
+import pytest
+
+from __Misc_Tools.zip_writer import zip_writer
+from __Misc_Tools.zip_writer.zip_writer import ParallelZipWriter
+
+MAX_INFLIGHT = 64 * 1024
+
+def text_bytes(rng, size):
+    words = [b"WESTRING", b"UNIT", b"Footman", b"=", b"\"", b"\n", b"attack", b"0123"]
+    data = bytearray()
+    while len(data) < size:
+        data += rng.choice(words)
+    return bytes(data[:size])
+
+@pytest.fixture
+def members(tmp_path):
+    """(arcname, content, source file or None for in-memory members) in archive order"""
+    rng = random.Random(0)
+    contents = [
+        ("ui/worldeditstrings.txt", text_bytes(rng, 40 * 1024)),
+        ("ui/empty.txt", b""),
+        ("sound/empty.mp3", b""),
+        ("sound/voice.mp3", rng.randbytes(20 * 1024)),
+        ("units/big.slk", text_bytes(rng, 5 * MAX_INFLIGHT)),
+        ("maps/big.w3x", rng.randbytes(3 * MAX_INFLIGHT)),
+        ("units/huge.txt", text_bytes(rng, 300 * 1024)),
+        ("ui/framedef/globalstrings.fdf", text_bytes(rng, 10 * 1024)),
+    ]
+    members = []
+    for i, (arcname, data) in enumerate(contents):
+        src = tmp_path / "src" / arcname
+        src.parent.mkdir(parents=True, exist_ok=True)
+        src.write_bytes(data)
+        members.append((arcname, data, src))
+    members.append(("ui/generated.txt", text_bytes(rng, 30 * 1024), None))
+    members.append(("ui/generated.mp3", rng.randbytes(1024), None))
+    members.append(("ui/generated_empty.fdf", b"", None))
+    return members
+
+def write_archive(zip_path, members):
+    with ParallelZipWriter(zip_path, workers=4, max_inflight_bytes=MAX_INFLIGHT) as zipf:
+        for arcname, data, src in members:
+            if src is None:
+                zipf.add_bytes(arcname, data, mtime=1700000000)
+            else:
+                zipf.add_file(src, arcname)
+
+@pytest.fixture(autouse=True)
+def small_streaming_threshold(monkeypatch):
+    # units/huge.txt goes through the streaming (ZipFile.write) path
+    monkeypatch.setattr(zip_writer, "MAX_PARALLEL_MEMBER_SIZE", 256 * 1024)
+
+def test_members_round_trip(tmp_path, members):
+    zip_path = tmp_path / "patch.zip"
+    write_archive(zip_path, members)
+
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert zipf.testzip() is None
+        assert zipf.namelist() == [arcname for arcname, _, _ in members]
+        for arcname, data, _ in members:
+            assert zipf.read(arcname) == data, arcname
+
+        info = {zinfo.filename: zinfo for zinfo in zipf.infolist()}
+    assert info["sound/voice.mp3"].compress_type == zipfile.ZIP_STORED
+    assert info["maps/big.w3x"].compress_type == zipfile.ZIP_STORED
+    assert info["ui/worldeditstrings.txt"].compress_type == zipfile.ZIP_DEFLATED
+    assert info["units/big.slk"].compress_type == zipfile.ZIP_DEFLATED
+    assert info["units/huge.txt"].compress_type == zipfile.ZIP_DEFLATED
+    assert info["ui/worldeditstrings.txt"].compress_size < info["ui/worldeditstrings.txt"].file_size
+
+def test_same_inputs_give_the_same_archive(tmp_path, members):
+    first, second = tmp_path / "first.zip", tmp_path / "second.zip"
+    write_archive(first, members)
+    write_archive(second, members)
+    assert first.read_bytes() == second.read_bytes()